@@ -0,0 +1,358 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from itertools import cycle
+
+import read
+from wordstore import WordStore
+
+
+SIZES = [10000, 100000, 1000000, 5000000]
+PAGES = [10, 100, 500]
+TARGETS = {'step': 2.0, 'increaseFontSize': 50.0, 'decreaseFontSize': 50.0}
+
+
+def iter_synthetic_words(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyzабвгдежз') for _ in range(rng.randint(1, 12)))
+                  for _ in range(20000)]
+    punctuation = ['', '', '', ',', '.']
+    for _ in range(count):
+        yield rng.choice(vocabulary) + rng.choice(punctuation)
+
+
+def synthetic_words(count, seed=0):
+    return list(iter_synthetic_words(count, seed))
+
+
+def application():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        import resource
+
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples):
+    samples = [sample * 1000 for sample in samples]
+    quantiles = statistics.quantiles(samples * (2 if len(samples) == 1 else 1), n=100, method='inclusive')
+    return {
+        'count': len(samples),
+        'p50 ms': quantiles[49],
+        'p90 ms': quantiles[89],
+        'p99 ms': quantiles[98],
+        'max ms': max(samples),
+    }
+
+
+def timed(operation, repeat, app, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+            app.processEvents()
+        start = time.perf_counter()
+        operation()
+        app.processEvents()
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def wait_for(condition, app, timeout=120):
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout:
+        app.processEvents()
+        time.sleep(0.001)
+    return time.perf_counter() - start
+
+
+def measure_memory(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def measure_access(words, lookups):
+    start = time.perf_counter()
+    for i in lookups:
+        words[i]
+    return (time.perf_counter() - start) / len(lookups) * 1e9
+
+
+def bench_wordstore(count):
+    source = synthetic_words(count)
+    lookups = [random.randrange(count) for _ in range(100000)]
+
+    words, list_size = measure_memory(lambda: [(word + ' ')[:-1] for word in source])
+    list_access = measure_access(words, lookups)
+    del words
+
+    store, store_size = measure_memory(lambda: WordStore.from_words(source))
+    store_access = measure_access(store, lookups)
+
+    return {
+        'words': count,
+        'list bytes': list_size,
+        'store bytes': store_size,
+        'list ns per access': list_access,
+        'store ns per access': store_access,
+    }
+
+
+def synthetic_pdf(filename, pages, words_per_page=400):
+    import fitz
+
+    words = synthetic_words(pages * words_per_page)
+    with fitz.open() as doc:
+        for i in range(pages):
+            page = doc.new_page()
+            text = ' '.join(words[i * words_per_page:(i + 1) * words_per_page])
+            page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=6)
+        doc.save(filename)
+
+
+def bench_pdf(pages, workers):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'book.pdf')
+        synthetic_pdf(filename, pages)
+
+        result = {'pages': pages, 'workers': workers}
+        cutoffs = read.PARALLEL_MIN_PAGES, read.SPAWN_MIN_PAGES
+        read.PARALLEL_MIN_PAGES = read.SPAWN_MIN_PAGES = 0
+        read.shutdown()
+        try:
+            for name, count in [('sequential', 1), ('cold pool', workers), ('warm pool', workers)]:
+                start = time.perf_counter()
+                words = sum(1 for _ in read.iter_words(filename, count))
+                result[f'{name} seconds'] = time.perf_counter() - start
+        finally:
+            read.PARALLEL_MIN_PAGES, read.SPAWN_MIN_PAGES = cutoffs
+            read.shutdown()
+        result['words'] = words
+        result['cold speedup'] = result['sequential seconds'] / result['cold pool seconds']
+        result['warm speedup'] = result['sequential seconds'] / result['warm pool seconds']
+    return result
+
+
+def bench_parse(count):
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'book.txt')
+        with open(filename, 'w', encoding='utf-8') as f:
+            line = []
+            for word in iter_synthetic_words(count):
+                line.append(word)
+                if len(line) == 1000:
+                    f.write(' '.join(line) + '\n')
+                    line = []
+            f.write(' '.join(line))
+        size = os.path.getsize(filename)
+
+        before = rss()
+        start = time.perf_counter()
+        words = WordStore.from_words(read.iter_words(filename))
+        seconds = time.perf_counter() - start
+        return {
+            'words': len(words),
+            'bytes': size,
+            'seconds': seconds,
+            'MB/s': size / seconds / 1e6,
+            'words/s': len(words) / seconds,
+            'rss growth bytes': rss() - before,
+        }
+
+
+def bench_engine(count, repeat):
+    app = application()
+    from PyQt5.QtWidgets import QLabel
+    import main
+
+    start = time.perf_counter()
+    words = WordStore.from_words(iter_synthetic_words(count))
+    store_seconds = time.perf_counter() - start
+
+    frame = main.MainFrame(words, QLabel(), {'speed': main.MainUI.DEFAULT_SPEED,
+                                             'font size': main.ScrollFrame.DEFAULT_FONT_SIZE})
+    frame.resize(800, 1000)
+    frame.show()
+    app.processEvents()
+    scroll_frame = frame.scroll_frame
+    index_seconds = wait_for(lambda: scroll_frame.lineIndex() is not None, app)
+
+    rng = random.Random(1)
+    widths = cycle([760, 840])
+    default_size = main.ScrollFrame.DEFAULT_FONT_SIZE
+
+    def step():
+        if scroll_frame.frames[scroll_frame.current_line].step():
+            scroll_frame.moveDown()
+
+    def greedy_fill():
+        begin = scroll_frame.frames[0].begin
+        for line in scroll_frame.frames:
+            begin = line.fill(begin)
+
+    def resize():
+        frame.resize(next(widths), 1000)
+        frame.applySize()
+
+    operations = {
+        'moveDown': (scroll_frame.moveDown, None),
+        'moveUp': (scroll_frame.moveUp, None),
+        'step': (step, None),
+        'jump': (lambda: scroll_frame.jump(rng.randrange(count)), None),
+        'fill': (scroll_frame.fill, None),
+        'greedy fill cold': (greedy_fill, scroll_frame.widths.clear),
+        'greedy fill warm': (greedy_fill, None),
+        'resizeEvent': (resize, None),
+        'increaseFontSize': (scroll_frame.increaseFontSize, lambda: scroll_frame.setFontSize(default_size)),
+        'decreaseFontSize': (scroll_frame.decreaseFontSize, lambda: scroll_frame.setFontSize(default_size + 5)),
+    }
+    timings = {}
+    for name, (operation, setup) in operations.items():
+        timings[name] = timed(operation, repeat, app, setup)
+        if name in TARGETS:
+            timings[name]['target p90 ms'] = TARGETS[name]
+            timings[name]['within target'] = timings[name]['p90 ms'] <= TARGETS[name]
+    result = {
+        'words': count,
+        'store bytes': words.nbytes(),
+        'store seconds': store_seconds,
+        'line index seconds': index_seconds,
+        'operations': timings,
+        'greedy fill speedup': timings['greedy fill cold']['p50 ms'] / timings['greedy fill warm']['p50 ms'],
+        'width cache': scroll_frame.widths.stats(),
+        'rss bytes': rss(),
+    }
+
+    frame.hide()
+    frame.deleteLater()
+    app.processEvents()
+    return result
+
+
+def bench_startup():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    code = ('import sys, time; start = time.perf_counter(); import main; '
+            'print(time.perf_counter() - start, "fitz" in sys.modules)')
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+
+    from PyQt5.QtCore import QEvent, QObject
+    import main
+
+    class PaintWatcher(QObject):
+        painted = None
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint and self.painted is None:
+                self.painted = time.perf_counter()
+            return False
+
+    start = time.perf_counter()
+    app = application()
+    window = main.MainUI(1920, 1080, 40)
+    watcher = PaintWatcher()
+    window.installEventFilter(watcher)
+    window.show()
+    while watcher.painted is None and time.perf_counter() - start < 10:
+        app.processEvents()
+    window.restore('')
+    app.processEvents()
+    window.hide()
+
+    return {
+        'import seconds': float(output[0]),
+        'fitz imported': output[1] == 'True',
+        'first paint seconds': watcher.painted - start if watcher.painted is not None else None,
+    }
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def bench_suite(sizes, pages, repeat):
+    result = {
+        'meta': metadata(),
+        'startup': bench_startup(),
+        'parse': [bench_parse(count) for count in sizes],
+        'engine': [bench_engine(count, repeat) for count in sizes],
+    }
+    if importlib.util.find_spec('fitz') is not None:
+        result['pdf'] = [bench_pdf(count, read.WORKERS) for count in pages]
+    return result
+
+
+def report(result):
+    for key, value in result.items():
+        print(f'{key}: {value:.3f}' if isinstance(value, float) else f'{key}: {value}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    wordstore = commands.add_parser('wordstore')
+    wordstore.add_argument('--words', type=int, default=1000000)
+
+    pdf = commands.add_parser('pdf')
+    pdf.add_argument('--pages', type=int, default=500)
+    pdf.add_argument('--workers', type=int, default=read.WORKERS)
+
+    commands.add_parser('startup')
+
+    suite = commands.add_parser('suite')
+    suite.add_argument('--sizes', type=lambda value: [int(size) for size in value.split(',')], default=SIZES)
+    suite.add_argument('--pages', type=lambda value: [int(count) for count in value.split(',')], default=PAGES)
+    suite.add_argument('--repeat', type=int, default=200)
+    suite.add_argument('--output')
+
+    args = parser.parse_args()
+    if args.command == 'wordstore':
+        report(bench_wordstore(args.words))
+    elif args.command == 'pdf':
+        report(bench_pdf(args.pages, args.workers))
+    elif args.command == 'startup':
+        report(bench_startup())
+    elif args.command == 'suite':
+        result = json.dumps(bench_suite(args.sizes, args.pages, args.repeat), indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(result)
+        else:
+            print(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import hashlib
+import mmap
+import os
+import struct
+
+import perf
+import read
+from paged import PageIndex, PagedWords
+from search import SearchIndex
+from wordstore import WordStore
+
+MAGIC = b'RATK'
+INDEX_MAGIC = b'RAIX'
+PAGES_MAGIC = b'RAPG'
+VERSION = 1
+INDEX_VERSION = 2
+HEADER = struct.Struct('<4sIQqQ32s')
+
+MAX_SIZE = 1 << 30
+USE_HASH = False
+
+
+def _base_dir():
+    if os.name == 'nt':
+        return os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    return os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+
+
+CACHE_DIR = os.path.join(_base_dir(), 'ReadingAppQt', 'tokens')
+
+
+def cache_path(filename, suffix='.tok'):
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, key + suffix)
+
+
+def file_digest(filename):
+    h = hashlib.blake2b(digest_size=32)
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(read.CHUNK_SIZE), b''):
+            h.update(block)
+    return h.digest()
+
+
+def file_key(filename, use_hash=None):
+    if use_hash is None:
+        use_hash = USE_HASH
+    stat = os.stat(filename)
+    digest = file_digest(filename) if use_hash else bytes(32)
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def _check(f, filename, expected, expected_version=VERSION):
+    magic, version, size, mtime, count, digest = HEADER.unpack(f.read(HEADER.size))
+    if magic != expected or version != expected_version:
+        return None
+    if (size, mtime, digest) != file_key(filename, any(digest)):
+        return None
+    return count
+
+
+def _map(filename, path, expected, version=VERSION):
+    with open(path, 'rb') as f:
+        count = _check(f, filename, expected, version)
+        if count is None:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    os.utime(path)
+    return memoryview(mm)[HEADER.size:], count
+
+
+def _write(filename, path, magic, count, chunks, version=VERSION):
+    tmp = path + '.tmp'
+    try:
+        size, mtime, digest = file_key(filename)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(magic, version, size, mtime, count, digest))
+            for chunk in chunks:
+                f.write(chunk)
+        os.replace(tmp, path)
+    except OSError:
+        return
+    evict()
+
+
+def is_cached(filename):
+    for suffix, magic in [('.tok', MAGIC), ('.pgx', PAGES_MAGIC)]:
+        try:
+            with open(cache_path(filename, suffix), 'rb') as f:
+                if _check(f, filename, magic) is not None:
+                    return True
+        except (OSError, struct.error):
+            continue
+    return False
+
+
+def load(filename):
+    try:
+        entry = _map(filename, cache_path(filename), MAGIC)
+        if entry is None:
+            return None
+        return WordStore.from_buffer(*entry)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def store(filename, words):
+    if not isinstance(words, WordStore):
+        words = WordStore.from_words(words)
+    _write(filename, cache_path(filename), MAGIC, len(words), [words.offsets_bytes(), words.blob])
+
+
+def load_index(filename, words):
+    try:
+        entry = _map(filename, cache_path(filename, '.idx'), INDEX_MAGIC, INDEX_VERSION)
+        if entry is None:
+            return None
+        buffer, count = entry
+        return SearchIndex.from_buffer(words, buffer, count)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def store_index(filename, index):
+    _write(filename, cache_path(filename, '.idx'), INDEX_MAGIC, len(index), index.chunks(), INDEX_VERSION)
+
+
+def load_pages(filename):
+    try:
+        entry = _map(filename, cache_path(filename, '.pgx'), PAGES_MAGIC)
+        if entry is None:
+            return None
+        return PageIndex.from_buffer(*entry)
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def store_pages(filename, index):
+    _write(filename, cache_path(filename, '.pgx'), PAGES_MAGIC, len(index), index.chunks())
+
+
+def read_pages(filename, progress=None, workers=None):
+    index = load_pages(filename)
+    if index is None:
+        with perf.span('page index'):
+            index = PageIndex.build(read.iter_page_tokens(filename, workers, progress or read._ignore_progress))
+        store_pages(filename, index)
+    return PagedWords(filename, index)
+
+
+def load_max_size():
+    try:
+        with open(os.path.join(CACHE_DIR, 'max-size')) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return MAX_SIZE
+
+
+def store_max_size(max_size):
+    path = os.path.join(CACHE_DIR, 'max-size')
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        f.write(str(max_size))
+    os.replace(path + '.tmp', path)
+
+
+def evict(max_size=None):
+    if max_size is None:
+        max_size = load_max_size()
+    try:
+        scanned = [entry for entry in os.scandir(CACHE_DIR) if entry.name.endswith(('.tok', '.idx', '.pgx'))]
+    except OSError:
+        return
+
+    entries = []
+    for entry in scanned:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def read_words(filename, progress=None, workers=None):
+    if not filename:
+        return []
+    words = load(filename)
+    if words is None and filename.split('.')[-1] == 'pdf' and read.page_count(filename) >= read.LAZY_MIN_PAGES:
+        return read_pages(filename, progress, workers)
+    if words is None:
+        with perf.span('parse'):
+            words = WordStore.from_words(read.iter_words(filename, workers, progress))
+        store(filename, words)
+    return words
@@ -0,0 +1,97 @@
+import os
+import sys
+from collections import OrderedDict
+
+
+def words_nbytes(words):
+    if hasattr(words, 'nbytes'):
+        return words.nbytes()
+    return sys.getsizeof(words) + sum(map(sys.getsizeof, words))
+
+
+class Document:
+    def __init__(self, words, main_frame=None, index=None):
+        self.words = words
+        self.main_frame = main_frame
+        self.index = index
+        self.key = None
+
+    def nbytes(self):
+        size = words_nbytes(self.words)
+        if self.index is not None:
+            size += sum(values.itemsize * len(values)
+                        for values in [self.index.starts, self.index.positions, self.index.ids])
+            size += words_nbytes(self.index.terms)
+        if self.main_frame is not None:
+            size += self.main_frame.scroll_frame.nbytes()
+        return size
+
+    def release(self):
+        if self.main_frame is not None:
+            self.main_frame.deleteLater()
+            self.main_frame = None
+
+
+def file_stat(filename):
+    stat = os.stat(filename)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DocumentCache:
+    MAX_BYTES = 512 << 20
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = self.MAX_BYTES if max_bytes is None else max_bytes
+        self.documents = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.documents)
+
+    def take(self, filename):
+        document = self.documents.pop(filename, None)
+        self.sizes.pop(filename, None)
+        try:
+            if document is not None and document.key == file_stat(filename):
+                self.hits += 1
+                return document
+        except OSError:
+            pass
+        if document is not None:
+            document.release()
+        self.misses += 1
+        return None
+
+    def put(self, filename, document):
+        try:
+            document.key = file_stat(filename)
+        except OSError:
+            document.release()
+            return
+        self.discard(filename)
+        self.documents[filename] = document
+        self.sizes[filename] = document.nbytes()
+        self.evict()
+
+    def discard(self, filename):
+        document = self.documents.pop(filename, None)
+        self.sizes.pop(filename, None)
+        if document is not None:
+            document.release()
+
+    def evict(self):
+        while self.documents and self.nbytes() > self.max_bytes:
+            filename = next(iter(self.documents))
+            self.discard(filename)
+
+    def clear(self):
+        for filename in list(self.documents):
+            self.discard(filename)
+
+    def nbytes(self):
+        return sum(self.sizes.values())
+
+    def stats(self):
+        return {'documents': len(self.documents), 'bytes': self.nbytes(), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,67 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cache
+import read
+
+EXTENSIONS = ('.pdf', '.txt')
+
+
+def iter_documents(directory):
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def ingest_file(filename):
+    try:
+        return len(cache.read_words(filename, workers=1)), None
+    except (OSError, ValueError, RuntimeError) as e:
+        return 0, str(e)
+
+
+def ingest(directory, workers=None, max_size=None):
+    if workers is None:
+        workers = read.WORKERS
+    if max_size is not None:
+        cache.store_max_size(max_size)
+
+    pending = []
+    skipped = 0
+    for filename in iter_documents(directory):
+        if cache.is_cached(filename):
+            skipped += 1
+        else:
+            pending.append((os.path.getsize(filename), filename))
+    pending.sort(reverse=True)
+
+    start = time.perf_counter()
+    done = failed = total_bytes = 0
+    with ProcessPoolExecutor(max(1, workers)) as executor:
+        futures = {executor.submit(ingest_file, filename): (size, filename) for size, filename in pending}
+        for future in as_completed(futures):
+            size, filename = futures[future]
+            count, error = future.result()
+            if error is not None:
+                failed += 1
+                print(f'{filename}: {error}')
+                continue
+            done += 1
+            total_bytes += size
+            print(f'{filename}: {count} words')
+    seconds = time.perf_counter() - start
+
+    result = {
+        'files': done,
+        'skipped': skipped,
+        'failed': failed,
+        'bytes': total_bytes,
+        'seconds': seconds,
+        'files/s': done / seconds if seconds else 0.0,
+        'MB/s': total_bytes / seconds / 1e6 if seconds else 0.0,
+    }
+    print(f"{done} files ingested, {skipped} up to date, {failed} failed in {seconds:.1f} s: "
+          f"{result['files/s']:.2f} files/s, {result['MB/s']:.2f} MB/s")
+    return result
@@ -0,0 +1,81 @@
+from array import array
+from bisect import bisect_right
+from itertools import accumulate
+
+from PyQt5.QtCore import pyqtSignal
+from PyQt5.QtGui import QFont, QFontMetrics
+
+from loader import Worker
+from segments import segment
+
+
+class LineIndex:
+    def __init__(self, key, starts, view):
+        self.key = key
+        self.starts = starts
+        self.view = view
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def line_of(self, position):
+        return bisect_right(self.starts, position) - 1
+
+    def start(self, line):
+        if line < 0:
+            return 0
+        return self.starts[min(line, len(self.starts) - 1)]
+
+    def end(self, line):
+        if line < 0:
+            return 0
+        return self.starts[min(line + 1, len(self.starts) - 1)]
+
+    @staticmethod
+    def build(words, widths, space, line_width, key, interrupted=lambda: False):
+        prefix = array('q', [0])
+        prefix.extend(accumulate(map(widths.__getitem__, words)))
+        if interrupted():
+            return None
+
+        limit = line_width - 2 * space
+        count = len(prefix) - 1
+        starts = array('q')
+        begin = 0
+        while begin < count:
+            starts.append(begin)
+            end = bisect_right(prefix, prefix[begin] + limit) - 1
+            begin = max(end, begin + 1)
+        starts.append(count)
+        return LineIndex(key, starts, words)
+
+
+class LineIndexer(Worker):
+    built = pyqtSignal(object)
+
+    def __init__(self, words, family, size, width, known=None):
+        super().__init__()
+        self.words = words
+        self.key = (family, size, width)
+        self.known = known or {}
+
+    def run(self):
+        family, size, width = self.key
+        font = QFont(family)
+        font.setPointSize(size)
+        metrics = QFontMetrics(font)
+
+        widths = dict.fromkeys(self.words)
+        for i, word in enumerate(widths):
+            if i % 1000 == 0 and self.isInterruptionRequested():
+                return
+            known = self.known.get(word + ' ')
+            widths[word] = metrics.width(word + ' ') if known is None else known
+
+        space = metrics.width(' ')
+        view = segment(self.words, widths, width - 2 * space, metrics.width, self.isInterruptionRequested)
+        if view is None:
+            return
+        index = LineIndex.build(view, widths, space, width, self.key, self.isInterruptionRequested)
+        if index is not None and not self.isInterruptionRequested():
+            self.built.emit(index)
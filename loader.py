@@ -0,0 +1,87 @@
+from PyQt5.QtCore import QThread, pyqtSignal
+
+import cache
+import perf
+import read
+from search import SearchIndex, snippet
+
+_running = set()
+
+
+class Worker(QThread):
+    def start(self, *args):
+        _running.add(self)
+        self.finished.connect(lambda: _running.discard(self))
+        super().start(*args)
+
+
+class DocumentLoader(Worker):
+    progress = pyqtSignal(int, int)
+    loaded = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+        self.percent = -1
+
+    def report(self, done, total):
+        if self.isInterruptionRequested():
+            raise read.Cancelled
+        percent = done * 100 // total if total else 100
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(done, total)
+
+    def run(self):
+        try:
+            words = cache.read_words(self.filename, self.report)
+        except read.Cancelled:
+            return
+        except Exception as e:
+            self.failed.emit(str(e) or type(e).__name__)
+            return
+        if not self.isInterruptionRequested():
+            self.loaded.emit(words)
+
+
+class SearchIndexer(Worker):
+    built = pyqtSignal(object)
+
+    def __init__(self, filename, words):
+        super().__init__()
+        self.filename = filename
+        self.words = words
+
+    def run(self):
+        index = cache.load_index(self.filename, self.words)
+        if index is None:
+            with perf.span('index'):
+                index = SearchIndex.build(self.words, self.isInterruptionRequested)
+            if index is None:
+                return
+            cache.store_index(self.filename, index)
+        if not self.isInterruptionRequested():
+            self.built.emit(index)
+
+
+class SnippetLoader(Worker):
+    loaded = pyqtSignal(int, str)
+
+    def __init__(self, words, hits, context):
+        super().__init__()
+        self.words = words
+        self.hits = hits
+        self.context = context
+
+    def run(self):
+        for row, position in enumerate(self.hits):
+            if self.isInterruptionRequested():
+                return
+            self.loaded.emit(row, snippet(self.words, position, self.context))
+
+
+def stop_all():
+    for worker in list(_running):
+        worker.requestInterruption()
+        worker.wait()
@@ -1,109 +1,345 @@
+import argparse
 import functools
 import os
+import statistics
 import sys
+import time
+from collections import OrderedDict, deque
 
 from PyQt5 import QtGui
-from PyQt5.QtCore import Qt, QEvent, QTimer
-from PyQt5.QtGui import QResizeEvent
+from PyQt5.QtCore import Qt, QEvent, QTimer, QSize, QRectF, QAbstractListModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QResizeEvent, QPainter, QPalette
 from PyQt5.QtWidgets import QApplication, QLabel, QFrame, QVBoxLayout, QWidget, \
-    QScrollArea, QHBoxLayout, QMainWindow, QAction, QFileDialog
+    QScrollArea, QHBoxLayout, QMainWindow, QAction, QFileDialog, QDialog, QLineEdit, QListView, \
+    QMessageBox
 
-import read
+import ingest
 import save
+import loader
+import perf
+import read
 from dark_fusion import dark_fusion
+from documents import Document, DocumentCache
+from layout import LineIndexer
+from loader import DocumentLoader, SearchIndexer, SnippetLoader
+from metrics import WidthCache
+from search import snippet
 
 
 class ScrollFrame(QFrame):
+    DEFAULT_FONT_SIZE = 15
+    MAX_LINE_INDEXES = 4
+    MAX_CATCH_UP = 1.0
+    LATENESS_SAMPLES = 1000
+    INITIAL_LINES = 20
+    MIN_LINES = 3
+    READ_AHEAD = 2
+    LINE_MARGIN = 20
+    HIGHLIGHT_LINE = 5
+
     def __init__(self, words, progress_label, *args):
         super().__init__(*args)
 
-        self.font_size = 15
+        self.widths = WidthCache()
+        self._font_family = 'Verdana'  # Open Sans
+        self.font_size = self.DEFAULT_FONT_SIZE
         self.current_line = 0
 
         self.scroll = None
         self.speed = None
-        self.pause_counter = 0
         self.words = words
+        self.view = words
         self.progress_label = progress_label
 
         self.pause = True
-        self.font_family = 'Verdana'  # Open Sans
+        self.late_policy = 'catch up'
+        self.run_start = None
+        self.run_end = None
+        self.run_words = 0
+        self.next_tick = None
+        self.lateness = deque(maxlen=self.LATENESS_SAMPLES)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.run)
+
+        self.highlight_line = self.HIGHLIGHT_LINE
+        self.viewport_height = None
 
-        self.highlight_line = 5
-        self.highlight_line_style = 'background-color:black;'
+        self.renderer = os.environ.get('READER_RENDERER', 'labels')
+        if self.renderer not in RENDERERS:
+            self.renderer = 'labels'
 
-        self.INITIAL_LINES = 20
-        self.frames = [ExpandFrame(words) for _ in range(self.INITIAL_LINES)]
+        self.line_indexes = OrderedDict()
+        self.indexer = None
+
+        self.frames = [RENDERERS[self.renderer](words, self.widths) for _ in range(self.INITIAL_LINES)]
         self.updateProgressBar()
 
-        self.setStyleSheet(f'font-size: {self.font_size}pt;'
-                           f'font-family: {self.font_family};')
+        self.applyFont()
+
+    @property
+    def font_size(self):
+        return self._font_size
+
+    @font_size.setter
+    def font_size(self, font_size):
+        self._font_size = font_size
+        self.widths.setFont(self._font_family, font_size)
+
+    @property
+    def font_family(self):
+        return self._font_family
+
+    @font_family.setter
+    def font_family(self, font_family):
+        self._font_family = font_family
+        self.widths.setFont(font_family, self._font_size)
+
+    def applyFont(self):
+        self.setFont(self.widths.font)
 
     def setScroll(self, scroll):
         self.scroll = scroll
 
+    def setRenderer(self, renderer):
+        if renderer == self.renderer:
+            return
+        self.renderer = renderer
+
+        old_frames = self.frames
+        self.frames = [RENDERERS[renderer](self.view, self.widths) for _ in old_frames]
+        for frame, old_frame in zip(self.frames, old_frames):
+            frame.width = old_frame.width
+            self.layout().replaceWidget(old_frame, frame)
+            old_frame.deleteLater()
+
+        self.frames[self.current_line].begin = old_frames[self.current_line].begin
+        self.frames[self.current_line].highlight_position = old_frames[self.current_line].highlight_position
+        if self.words:
+            self.frames[self.current_line].highlightLine(True)
+        if self.frames[0].width is not None:
+            self.fill()
+
+    def restore(self, state):
+        self.speed = state['speed']
+        self.font_size = state['font size']
+        self.applyFont()
+
+        if state.get('position') is None:
+            return
+        self.current_line = state['current line']
+        for frame in self.frames:
+            frame.width = state['width']
+        self.frames[self.current_line].begin = state['position']
+        self.frames[self.current_line].highlight_position = state['highlight']
+
+    def lineIndex(self):
+        key = (self.widths.family, self.widths.size, self.frames[0].width)
+        index = self.line_indexes.get(key)
+        if index is None and key[2] is not None and self.indexable():
+            self.requestLineIndex(key)
+        return index
+
+    def indexable(self):
+        return bool(self.words) and not getattr(self.words, 'lazy', False)
+
+    def requestLineIndex(self, key):
+        if self.indexer is not None:
+            if self.indexer.key == key:
+                return
+            self.indexer.requestInterruption()
+        self.indexer = LineIndexer(self.words, *key, self.widths.cached())
+        self.indexer.built.connect(self.setLineIndex)
+        self.indexer.start()
+
+    def setLineIndex(self, index):
+        self.line_indexes[index.key] = index
+        while len(self.line_indexes) > self.MAX_LINE_INDEXES:
+            self.line_indexes.popitem(last=False)
+        if self.indexer is not None and self.indexer.key == index.key:
+            self.indexer = None
+
+        if self.isVisible() and index.key == (self.widths.family, self.widths.size, self.frames[0].width):
+            self.fill()
+            self.updateProgressBar()
+
+    def toSource(self, position):
+        if self.view is self.words:
+            return position, 0
+        return self.view.to_source(position)
+
+    def toDisplay(self, position, piece=0):
+        if self.view is self.words:
+            return position
+        return self.view.to_display(position, piece)
+
+    def setView(self, view):
+        current = self.frames[self.current_line]
+        position = self.toSource(current.begin + max(current.highlight_position, 1) - 1)
+        if current.highlight_position > 0:
+            current.highlightWord(False)
+            current.highlight_position = 1
+
+        self.view = view
+        for frame in self.frames:
+            frame.words = view
+        current.begin = self.toDisplay(*position)
+
+    def fillLine(self, frame, begin):
+        index = self.lineIndex()
+        if index is None or index.view is not self.view:
+            return frame.fill(begin)
+        frame.populate(begin, max(begin, index.end(index.line_of(begin))))
+        return frame.end
+
+    def fillLineReversed(self, frame, end):
+        index = self.lineIndex()
+        if index is None or index.view is not self.view:
+            return frame.fillReversed(end)
+        begin = index.start(index.line_of(end - 1)) if end > 0 else 0
+        frame.populate(begin, end)
+        return begin
+
+    def fillFromIndex(self, index):
+        current = self.frames[self.current_line]
+        word = current.begin + max(current.highlight_position, 1) - 1
+        line = index.line_of(word)
+        if current.highlight_position > 0:
+            current.highlightWord(False)
+            current.highlight_position = word - index.start(line) + 1
+
+        for i, frame in enumerate(self.frames):
+            frame.populate(index.start(line + i - self.current_line), index.end(line + i - self.current_line))
+        if current.highlight_position > 0:
+            current.highlightWord(True)
+
+    @perf.timed('layout')
     def fill(self):
+        index = self.lineIndex()
+        if index is not None:
+            if index.view is not self.view:
+                self.setView(index.view)
+            self.fillFromIndex(index)
+            return
+
         end = self.frames[self.current_line].begin
 
-        for i, frame in enumerate(self.frames[:self.current_line][::-1]):
-            begin, counter = frame.fillReversed(end)
-            if counter != 0:
-                for j in range(self.current_line - i, self.current_line + 1):
-                    self.frames[j].begin += counter
-                    self.frames[j].end += counter
-            end = begin
+        for frame in self.frames[:self.current_line][::-1]:
+            end = frame.fillReversed(end)
 
         begin = self.frames[self.current_line].begin
-        for i, frame in enumerate(self.frames[self.current_line:]):
-            end = frame.fill(begin)
-            begin = end
+        for frame in self.frames[self.current_line:]:
+            begin = frame.fill(begin)
 
     def jump(self, position, highlight_position=1):
-        self.frames[self.current_line].begin = position
-        self.frames[self.current_line].highlight_position = highlight_position
+        current = self.frames[self.current_line]
+        if current.highlight_position > 0:
+            current.highlightWord(False)
+        current.begin = self.toDisplay(position)
+        current.highlight_position = highlight_position
         self.fill()
         self.updateProgressBar()
 
-    def increaseFontSize(self):
-        self.font_size = min(40, self.font_size + 5)
-        self.setStyleSheet(f'font-size: {self.font_size}pt;'
-                           f'font-family: {self.font_family};')
+    def reflow(self):
+        current = self.frames[self.current_line]
+        if self.lineIndex() is None:
+            if self.indexable() and current.end > current.begin:
+                return
+            if current.highlight_position > 1:
+                current.highlightWord(False)
+                current.begin += current.highlight_position - 1
+                current.highlight_position = 1
         self.fill()
 
+    def nbytes(self):
+        return sum(8 * len(index.starts) for index in self.line_indexes.values())
+
+    def lineCount(self):
+        if self.viewport_height is None:
+            return len(self.frames)
+        line_height = self.widths.metrics.height() + self.LINE_MARGIN
+        return max(self.MIN_LINES, -(-self.viewport_height // line_height) + self.READ_AHEAD)
+
+    def setLineCount(self, count):
+        self.highlight_line = min(self.HIGHLIGHT_LINE, (count - self.READ_AHEAD) // 3)
+        top = max(0, self.current_line - self.highlight_line)
+        if count == len(self.frames) and top == 0:
+            return False
+
+        removed = self.frames[:top] + self.frames[top + count:]
+        self.frames = self.frames[top:top + count]
+        self.current_line -= top
+        for frame in removed:
+            self.layout().removeWidget(frame)
+            frame.deleteLater()
+
+        while len(self.frames) < count:
+            frame = RENDERERS[self.renderer](self.view, self.widths)
+            frame.width = self.frames[0].width
+            self.layout().insertWidget(len(self.frames), frame)
+            self.frames.append(frame)
+        return True
+
+    def setViewport(self, width, height):
+        self.viewport_height = height
+        changed = self.setLineCount(self.lineCount())
+        if self.frames[0].width != width:
+            for frame in self.frames:
+                frame.width = width
+            changed = True
+        if changed:
+            self.reflow()
+
+    def setFontSize(self, font_size):
+        self.font_size = font_size
+        self.applyFont()
+        self.setLineCount(self.lineCount())
+        self.reflow()
+
+    def increaseFontSize(self):
+        self.setFontSize(min(40, self.font_size + 5))
+
     def decreaseFontSize(self):
-        self.font_size = max(10, self.font_size - 5)
-        self.setStyleSheet(f'font-size: {self.font_size}pt;'
-                           f'font-family: {self.font_family};')
-        self.fill()
+        self.setFontSize(max(10, self.font_size - 5))
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.frames[0].width is not None:
+            self.fill()
+        self.updateProgressBar()
 
     def updateProgressBar(self):
+        if not self.isVisible():
+            return
         self.progress_label.setText(
-            f"Прогресс = {self.frames[self.current_line].begin / max(len(self.words), 1) * 100:.2f}%")
+            f"Прогресс = {self.frames[self.current_line].begin / max(len(self.view), 1) * 100:.2f}%")
 
     def moveDown(self):
-        if self.frames[self.current_line].begin == len(self.words) or not self.words:
+        if self.frames[self.current_line].begin == len(self.view) or not self.words:
             self.pause = True
             return
 
         last_frame = self.frames[self.current_line]
-        last_frame.labels[last_frame.highlight_position].setStyleSheet('')
+        last_frame.highlightWord(False)
         last_frame.highlight_position = 0
 
         if self.current_line < self.highlight_line:
             self.current_line += 1
-            self.frames[self.current_line - 1].setStyleSheet('')
-            self.frames[self.current_line].setStyleSheet(self.highlight_line_style)
+            self.frames[self.current_line - 1].highlightLine(False)
+            self.highlightCurrent()
             self.updateProgressBar()
-
-            self.frames[self.current_line].labels[1].setStyleSheet(ExpandFrame.highlight_word_style)
-            self.frames[self.current_line].highlight_position = 1
             return
 
-        self.frames[self.current_line].highlight_position = 1
-        for i in range(len(self.frames) - 1):
-            self.frames[i].populate(self.frames[i + 1].begin, self.frames[i + 1].end)
+        self.frames[self.current_line].highlightLine(False)
+        frame = self.frames.pop(0)
+        self.frames.append(frame)
+        self.layout().removeWidget(frame)
+        self.layout().insertWidget(len(self.frames) - 1, frame)
+        self.fillLine(frame, self.frames[-2].end)
 
-        self.frames[-1].fill(self.frames[-1].end)
+        self.highlightCurrent()
         self.updateProgressBar()
 
     def moveUp(self):
@@ -111,133 +347,143 @@ class ScrollFrame(QFrame):
             return
 
         last_frame = self.frames[self.current_line]
-        last_frame.labels[last_frame.highlight_position].setStyleSheet('')
+        last_frame.highlightWord(False)
         last_frame.highlight_position = 0
 
         if self.frames[0].begin == 0:
             self.current_line -= 1
-            self.frames[self.current_line + 1].setStyleSheet('')
-            self.frames[self.current_line].setStyleSheet(self.highlight_line_style)
+            self.frames[self.current_line + 1].highlightLine(False)
+            self.highlightCurrent()
             self.updateProgressBar()
-            self.frames[self.current_line].labels[1].setStyleSheet(ExpandFrame.highlight_word_style)
-            self.frames[self.current_line].highlight_position = 1
             return
 
-        self.frames[self.current_line].highlight_position = 1
-        for i in range(len(self.frames) - 1, 0, -1):
-            self.frames[i].populate(self.frames[i - 1].begin, self.frames[i - 1].end)
+        self.frames[self.current_line].highlightLine(False)
+        frame = self.frames.pop()
+        self.frames.insert(0, frame)
+        self.layout().removeWidget(frame)
+        self.layout().insertWidget(0, frame)
+
+        self.fillLineReversed(frame, self.frames[1].begin)
 
-        begin, counter = self.frames[0].fillReversed(self.frames[0].begin)
-        if counter != 0:
-            for i in range(1, len(self.frames)):
-                self.frames[i].begin += counter
-                self.frames[i].end += counter
+        self.highlightCurrent()
         self.updateProgressBar()
 
+    def highlightCurrent(self):
+        current = self.frames[self.current_line]
+        current.highlightLine(True)
+        current.highlight_position = 1
+        current.highlightWord(True)
+
     def start(self):
         self.pause = (self.pause + 1) & 1
-        self.pause_counter += 1
-
-        if not self.pause:
-            self.firstRun(self.pause_counter)
 
-    def firstRun(self, counter):
         if self.pause:
-            return
-        timer = QTimer(self)
-        timer.setSingleShot(True)
+            self.timer.stop()
+        else:
+            self.firstRun()
 
-        def run(captured_self, captured_counter):
-            if captured_counter != captured_self.pause_counter or captured_self.pause:
-                return
+    def interval(self):
+        ratio = 60 / self.speed
+        if self.frames[self.current_line].highlight_position != 1:
+            return ratio
+        return ratio * 1.5
 
-            if captured_self.frames[captured_self.current_line].step():
-                captured_self.moveDown()
-            captured_self.firstRun(captured_counter)
+    def firstRun(self):
+        self.run_start = self.run_end = time.perf_counter()
+        self.run_words = 0
+        self.lateness.clear()
+        self.next_tick = self.run_start + self.interval()
+        self.schedule()
 
-        timer.timeout.connect(lambda: run(self, counter))
+    def schedule(self):
+        self.timer.start(max(0, round((self.next_tick - time.perf_counter()) * 1000)))
 
-        ratio = 60 * 1000 / self.speed
-        if self.frames[self.current_line].highlight_position != 1:
-            timer.start(int(ratio) + 1)
+    @perf.timed('tick')
+    def run(self):
+        if self.pause:
+            return
+        lateness = time.perf_counter() - self.next_tick
+        self.lateness.append(lateness)
+        if perf.ENABLED:
+            perf.record('lateness', self.next_tick, lateness)
+
+        if self.frames[self.current_line].step():
+            self.moveDown()
+        self.run_words += 1
+        self.run_end = time.perf_counter()
+        if self.pause:
+            return
+
+        self.next_tick += self.interval()
+        now = time.perf_counter()
+        if self.late_policy == 'skip' and self.next_tick < now:
+            self.next_tick = now
+        elif now - self.next_tick > self.MAX_CATCH_UP:
+            self.next_tick = now
+        self.schedule()
+
+    def pacingStats(self):
+        if self.run_start is None:
+            elapsed = 0
         else:
-            timer.start(int(ratio * 1.5))
+            elapsed = (self.run_end if self.pause else time.perf_counter()) - self.run_start
+        lateness = list(self.lateness)
+        return {
+            'wpm': self.run_words / elapsed * 60 if elapsed else 0.0,
+            'words': self.run_words,
+            'mean lateness': statistics.fmean(lateness) if lateness else 0.0,
+            'max lateness': max(lateness, default=0.0),
+            'jitter': statistics.pstdev(lateness) if len(lateness) > 1 else 0.0,
+        }
 
     def construct(self):
         if self.words:
-            self.frames[self.current_line].setStyleSheet(self.highlight_line_style)
+            self.frames[self.current_line].highlightLine(True)
         for frame in self.frames:
             self.layout().addWidget(frame)
         self.layout().addStretch()
 
 
-class ExpandFrame(QFrame):
-    highlight_word_style = 'color: red'
+class LineFrame(QFrame):
+    highlight_word_color = Qt.red
+    highlight_line_color = Qt.black
 
-    def __init__(self, words, *args):
+    def __init__(self, words, widths, *args):
         super().__init__(*args)
         self.words = words
+        self.widths = widths
 
-        self.hbox = QHBoxLayout(self)
-
-        self.space_label = QLabel(' ')
-        self.labels = [self.space_label]
-        # self.labels[-1].setStyleSheet('background-color:green')
-        self.hbox.addWidget(self.labels[0], 0)
-
-        self.hbox.setContentsMargins(0, 10, 0, 10)
-        self.hbox.setSpacing(0)
+        palette = self.palette()
+        palette.setColor(QPalette.BrightText, self.highlight_word_color)
+        palette.setColor(QPalette.Window, self.highlight_line_color)
+        self.setPalette(palette)
 
         self.begin = 0
         self.end = 0
         self.width = None
         self.highlight_position = 0
 
+    @perf.timed('step')
     def step(self):
         if self.begin == len(self.words):
             return True
-        self.labels[self.highlight_position].setStyleSheet('')
+        self.highlightWord(False)
         self.highlight_position += 1
-        if self.highlight_position == len(self.labels) - 1:
+        if self.highlight_position == self.end - self.begin + 1:
             return True
-        self.labels[self.highlight_position].setStyleSheet(self.highlight_word_style)
+        self.highlightWord(True)
         return False
 
     def get_width(self, text):
-        # return max(self.space_label.fontMetrics().width(text),
-        #            self.space_label.fontMetrics().boundingRect(text).width())
-        return self.space_label.fontMetrics().width(text)
-
-    def populate(self, begin, end, force_render=False):
-        if self.begin != begin or self.end != end or force_render:
-            self.begin = begin
-            self.end = end
-            for _ in range(len(self.labels) - 1):
-                self.hbox.removeWidget(self.labels[-1])
-                self.labels[-1].destroy()
-                self.labels.pop()
-
-            for i in range(begin, end):
-                self.labels.append(QLabel(self.words[i] + ' '))
-                self.labels[-1].setAlignment(Qt.AlignCenter)
-                self.hbox.addWidget(self.labels[-1], 1)
-
-            self.labels.append(QLabel(' '))
-            # self.labels[-1].setStyleSheet('background-color:green')
-            self.hbox.addWidget(self.labels[-1], 0)
-
-            if self.highlight_position > 0:
-                self.highlight_position = min(len(self.labels) - 2, self.highlight_position)
-                self.labels[self.highlight_position].setStyleSheet(self.highlight_word_style)
+        return self.widths.width(text)
 
+    @perf.timed('fill')
     def fill(self, begin):
         if begin == len(self.words):
             self.populate(begin, begin)
             return begin
 
         cur = begin
-        # self.space_label.adjustSize()
-
         cur_width = 2 * self.get_width(' ') + self.get_width(self.words[begin] + ' ')
         cur += 1
 
@@ -250,45 +496,18 @@ class ExpandFrame(QFrame):
 
         if cur == begin:
             cur += 1
-            force_render = False
-
-            # word = self.words[begin]
-            #
-            # # size = word.index('-') if '-' in word else len(word) // 2
-            # # if word[size] == '-':
-            # #     word = word[:size] + word[size + 1:]
-            #
-            # size = len(word) // 2
-            #
-            # self.words[begin] = word[:size] + '-'
-            # self.words.insert(begin + 1, word[size:])
-            # return self.fill(begin)
-        else:
-            force_render = False
-            # i = begin
-            #
-            # while i != cur - 1:
-            #     if self.words[i][-1] == '-':
-            #         self.words[i] = self.words[i][:-1] + self.words[i + 1]
-            #         cur -= 1
-            #         del self.words[i + 1]
-            #         force_render = True
-            #         continue
-            #     else:
-            #         i += 1
-
-        self.populate(begin, cur, force_render)
+
+        self.populate(begin, cur)
         return cur
 
+    @perf.timed('fillReversed')
     def fillReversed(self, end):
         if end == 0:
             print('Wtf why end = 0')
             self.populate(end, end)
-            return end, 0
+            return end
 
         cur = end - 1
-        # self.space_label.adjustSize()
-
         cur_width = 2 * self.get_width(' ') + self.get_width(self.words[cur] + ' ')
         cur -= 1
 
@@ -301,50 +520,132 @@ class ExpandFrame(QFrame):
 
         if cur + 1 == end:
             cur = end - 2
-            counter = 0
-            force_render = False
-
-            # word = self.words[end - 1]
-            #
-            # # size = word.index('-') if '-' in word else len(word) // 2
-            # #
-            # # if word[size] == '-':
-            # #     word = word[:size] + word[size + 1:]
-            #
-            # size = len(word) // 2
-            #
-            # self.words[end - 1] = word[:size] + '-'
-            # self.words.insert(end, word[size:])
-            #
-            # ans, counter = self.fillReversed(end + 1)
-            # return ans, counter + 1
-        else:
-            counter = 0
-            force_render = False
-            # i = cur + 1
-            #
-            # while i != end - 1:
-            #     if self.words[i][-1] == '-':
-            #         self.words[i] = self.words[i][:-1] + self.words[i + 1]
-            #         end -= 1
-            #         del self.words[i + 1]
-            #         counter -= 1
-            #         force_render = True
-            #         continue
-            #     else:
-            #         i += 1
-
-        self.populate(cur + 1, end, force_render)
-        return cur + 1, counter
+
+        self.populate(cur + 1, end)
+        return cur + 1
+
+
+class ExpandFrame(LineFrame):
+    def __init__(self, words, widths, *args):
+        super().__init__(words, widths, *args)
+
+        self.hbox = QHBoxLayout(self)
+
+        self.space_label = QLabel(' ')
+        self.tail_label = QLabel(' ')
+        # self.tail_label.setStyleSheet('background-color:green')
+        self.pool = []
+        self.labels = [self.space_label, self.tail_label]
+        self.hbox.addWidget(self.space_label, 0)
+        self.hbox.addWidget(self.tail_label, 0)
+
+        self.hbox.setContentsMargins(0, 10, 0, 10)
+        self.hbox.setSpacing(0)
+
+    @perf.timed('populate')
+    def populate(self, begin, end):
+        if self.begin != begin or self.end != end:
+            self.begin = begin
+            self.end = end
+            if 0 < self.highlight_position < len(self.labels) - 1:
+                self.highlightWord(False)
+
+            count = end - begin
+            shown = len(self.labels) - 2
+            while len(self.pool) < count:
+                label = QLabel(self)
+                label.setAlignment(Qt.AlignCenter)
+                self.hbox.insertWidget(len(self.pool) + 1, label, 1)
+                self.pool.append(label)
+
+            for label, i in zip(self.pool, range(begin, end)):
+                label.setText(self.words[i] + ' ')
+            for label in self.pool[shown:count]:
+                label.show()
+            for label in self.pool[count:shown]:
+                label.hide()
+            self.labels = [self.space_label, *self.pool[:count], self.tail_label]
+
+            if self.highlight_position > 0:
+                self.highlight_position = min(len(self.labels) - 2, self.highlight_position)
+                self.highlightWord(True)
+
+    def highlightWord(self, highlight):
+        self.labels[self.highlight_position].setForegroundRole(QPalette.BrightText if highlight
+                                                               else QPalette.WindowText)
+
+    def highlightLine(self, highlight):
+        self.setAutoFillBackground(highlight)
+
+
+class PaintedFrame(LineFrame):
+    def __init__(self, words, widths, *args):
+        super().__init__(words, widths, *args)
+        self.margins = 10
+        self.line_words = []
+        self.highlighted = False
+
+    def sizeHint(self):
+        return QSize(0, self.fontMetrics().height() + 2 * self.margins)
+
+    def minimumSizeHint(self):
+        return self.sizeHint()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.updateGeometry()
+
+    @perf.timed('populate')
+    def populate(self, begin, end):
+        if self.begin != begin or self.end != end:
+            self.begin = begin
+            self.end = end
+            self.line_words = [self.words[i] + ' ' for i in range(begin, end)]
+            if self.highlight_position > 0:
+                self.highlight_position = min(len(self.line_words), self.highlight_position)
+            self.update()
+
+    def highlightWord(self, highlight):
+        self.update()
+
+    def highlightLine(self, highlight):
+        self.highlighted = highlight
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        rect = self.rect()
+        if self.highlighted:
+            painter.fillRect(rect, self.highlight_line_color)
+        if not self.line_words:
+            return
+
+        space = self.get_width(' ')
+        widths = self.widths.measure(self.line_words)
+        extra = max(0, rect.width() - 2 * space - sum(widths)) / len(widths)
+        text_color = self.palette().color(QPalette.WindowText)
+
+        x = space
+        for i, (word, width) in enumerate(zip(self.line_words, widths), 1):
+            cell = QRectF(x, rect.top(), width + extra, rect.height())
+            painter.setPen(self.highlight_word_color if i == self.highlight_position else text_color)
+            painter.drawText(cell, Qt.AlignCenter, word)
+            x += width + extra
+
+
+RENDERERS = {'labels': ExpandFrame, 'painted': PaintedFrame}
 
 
 class MainFrame(QFrame):
+    RESIZE_DELAY = 100
+
     class MyScroller(QScrollArea):
         def wheelEvent(self, ev):
             if ev.type() == QEvent.Wheel:
                 ev.ignore()
 
-    def __init__(self, words, progress_bar):
+    def __init__(self, words, progress_bar, state=None):
         super(MainFrame, self).__init__()
 
         self.progress_bar = progress_bar
@@ -367,25 +668,159 @@ class MainFrame(QFrame):
         layout.setContentsMargins(*[self.margin] * 4)
 
         self.scroll_frame.setScroll(self.scroll)
+        if state is not None:
+            self.scroll_frame.restore(state)
         self.scroll_frame.construct()
+        if self.scroll_frame.frames[0].width is not None:
+            self.scroll_frame.fill()
+            self.scroll_frame.updateProgressBar()
 
-        self.cur_width = self.size().width()
+        self.cur_size = self.size()
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(self.RESIZE_DELAY)
+        self.resize_timer.timeout.connect(self.applySize)
 
     def resizeEvent(self, a0: QResizeEvent) -> None:
         super(MainFrame, self).resizeEvent(a0)
 
-        if self.cur_width == self.size().width():
+        if self.cur_size == self.size():
+            return
+        self.cur_size = self.size()
+
+        if self.scroll_frame.frames[0].width is None or not self.isVisible():
+            self.applySize()
+        else:
+            self.resize_timer.start()
+
+    def applySize(self):
+        self.resize_timer.stop()
+        self.scroll_frame.setViewport(self.cur_size.width() - 2 * self.margin - 2,
+                                      self.cur_size.height() - 2 * self.margin - 2)
+
+
+class SearchResults(QAbstractListModel):
+    def __init__(self, context, *args):
+        super().__init__(*args)
+        self.context = context
+        self.words = []
+        self.hits = []
+        self.snippets = {}
+        self.loader = None
+
+    def setHits(self, words, hits):
+        self.beginResetModel()
+        if self.loader is not None:
+            self.loader.requestInterruption()
+            self.loader = None
+        self.words = words
+        self.hits = hits
+        self.snippets = {}
+        if hits and getattr(words, 'lazy', False):
+            self.loader = SnippetLoader(words, hits, self.context)
+            self.loader.loaded.connect(functools.partial(self.setSnippet, self.loader))
+            self.loader.start()
+        self.endResetModel()
+
+    def setSnippet(self, source, row, text):
+        if source is not self.loader:
+            return
+        self.snippets[row] = text
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.hits)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        position = self.hits[index.row()]
+        if role == Qt.DisplayRole:
+            text = self.snippets.get(index.row())
+            if text is None:
+                if getattr(self.words, 'lazy', False):
+                    return f'Загрузка... ({position})'
+                text = self.snippets[index.row()] = snippet(self.words, position, self.context)
+            return text
+        if role == Qt.UserRole:
+            return position
+        return None
+
+
+class SearchDialog(QDialog):
+    LIMIT = 200
+    CONTEXT = 6
+    SEARCH_DELAY = 150
+    selected = pyqtSignal(int)
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.setWindowTitle('Поиск')
+        self.index = None
+
+        self.edit = QLineEdit()
+        self.status = QLabel('')
+        self.model = SearchResults(self.CONTEXT, self)
+        self.results = QListView()
+        self.results.setUniformItemSizes(True)
+        self.results.setModel(self.model)
+        vbox = QVBoxLayout(self)
+        for widget in [self.edit, self.status, self.results]:
+            vbox.addWidget(widget)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.SEARCH_DELAY)
+        self.search_timer.timeout.connect(self.search)
+        self.edit.textChanged.connect(lambda: self.search_timer.start())
+        self.edit.returnPressed.connect(self.activateFirst)
+        self.results.activated.connect(self.activate)
+
+    def setIndex(self, index):
+        self.index = index
+        self.search()
+
+    @perf.timed('search')
+    def search(self):
+        self.search_timer.stop()
+        self.model.setHits([], [])
+        if self.index is None:
+            self.status.setText('Индекс строится...')
             return
-        self.cur_width = self.size().width()
+        if not self.edit.text().strip():
+            self.status.setText('')
+            return
+
+        total, hits = self.index.find(self.edit.text(), self.LIMIT)
+        self.status.setText(f'Найдено: {total}')
+        self.model.setHits(self.index.words, hits)
+
+    def activateFirst(self):
+        if self.search_timer.isActive():
+            self.search()
+        self.activate(self.model.index(0))
+
+    def activate(self, index):
+        if index.isValid():
+            self.selected.emit(index.data(Qt.UserRole))
 
-        for frame in self.scroll_frame.frames:
-            frame.width = self.cur_width - 2 * self.margin - 2
-        self.scroll_frame.fill()
+    def showEvent(self, event):
+        for widget in [self.edit, self.results]:
+            widget.setFocusPolicy(Qt.StrongFocus)
+        super().showEvent(event)
+        self.edit.setFocus()
+        self.edit.selectAll()
 
 
 class MainUI(QMainWindow):
     version = 0
     MAX_RECENT = 5
+    AUTOSAVE_INTERVAL = 5000
+    DEFAULT_SPEED = 200
+    PERF_INTERVAL = 500
+    STATUS_TIMEOUT = 5000
+    KEEP_FRAMES = True
 
     def __init__(self, screen_width, screen_height, titlebar_height):
         super().__init__()
@@ -400,43 +835,75 @@ class MainUI(QMainWindow):
         self.setCentralWidget(frame)
 
         self.setGeometry(screen_width // 3, titlebar_height, screen_width // 3, screen_height - titlebar_height)
-        speed = 200
-        words = []
-        # words = read.read('text.txt')
 
         self.vbox = QVBoxLayout(frame)
         self.info_frame = QFrame()
-        self.initialize_info(speed)
-
-        self.main_frame = MainFrame(words, self.progress_label)
-        self.font_label.setText(f'Шрифт = {self.main_frame.scroll_frame.font_size}')
-        self.main_frame.scroll_frame.speed = speed
+        self.initialize_info(self.DEFAULT_SPEED)
+        self.font_label.setText(f'Шрифт = {ScrollFrame.DEFAULT_FONT_SIZE}')
         self.vbox.addWidget(self.info_frame)
-        self.vbox.addWidget(self.main_frame)
+        self.main_frame = None
+        self.documents = DocumentCache()
+        self.loader = None
+        self.indexer = None
+        self.search_dialog = SearchDialog(self)
+        self.search_dialog.selected.connect(self.jumpTo)
 
         self.setChildrenFocusPolicy(Qt.NoFocus)
-        self.show()
 
-    def populate(self, words):
-        speed = self.main_frame.scroll_frame.speed
-        font_size = self.main_frame.scroll_frame.font_size
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(lambda: save.save_progress(self))
+        self.autosave_timer.start(self.AUTOSAVE_INTERVAL)
+
+        self.perf_timer = QTimer(self)
+        self.perf_timer.timeout.connect(self.updatePerfOverlay)
+        if perf.ENABLED:
+            self.perf_timer.start(self.PERF_INTERVAL)
 
-        self.vbox.removeWidget(self.main_frame)
-        self.main_frame.deleteLater()
+    def defaultState(self):
+        if self.main_frame is None:
+            return {'speed': self.DEFAULT_SPEED, 'font size': ScrollFrame.DEFAULT_FONT_SIZE}
+        return {'speed': self.main_frame.scroll_frame.speed, 'font size': self.main_frame.scroll_frame.font_size}
 
-        self.main_frame = MainFrame(words, self.progress_label)
-        scroll_frame = self.main_frame.scroll_frame
-        scroll_frame.speed = speed
+    def populate(self, words, state=None):
+        main_frame = MainFrame(words, self.progress_label, state or self.defaultState())
+        self.stash()
+        self.setMainFrame(main_frame)
 
-        scroll_frame.font_size = font_size
-        scroll_frame.setStyleSheet(f'font-size: {scroll_frame.font_size}pt;'
-                                   f'font-family: {scroll_frame.font_family};')
-        # scroll_frame.fill()
+    def setMainFrame(self, main_frame):
+        self.main_frame = main_frame
+        scroll_frame = main_frame.scroll_frame
+        self.speed_label.setText(f"Скорость = {scroll_frame.speed} слов в минуту")
+        self.font_label.setText(f"Шрифт = {scroll_frame.font_size}")
 
-        self.vbox.addWidget(self.main_frame)
+        self.vbox.addWidget(main_frame)
+        main_frame.show()
+        scroll_frame.updateProgressBar()
 
         self.setChildrenFocusPolicy(Qt.NoFocus)
 
+    def stash(self, keep=True):
+        main_frame = self.main_frame
+        if main_frame is None:
+            return
+        save.save_progress(self)
+        self.main_frame = None
+        self.vbox.removeWidget(main_frame)
+        main_frame.hide()
+        scroll_frame = main_frame.scroll_frame
+        scroll_frame.pause = True
+        scroll_frame.timer.stop()
+        if scroll_frame.indexer is not None:
+            scroll_frame.indexer.requestInterruption()
+            scroll_frame.indexer = None
+
+        if keep and self.filename and scroll_frame.words:
+            document = Document(scroll_frame.words, main_frame, self.search_dialog.index)
+            if not self.KEEP_FRAMES:
+                document.release()
+            self.documents.put(self.filename, document)
+        else:
+            main_frame.deleteLater()
+
     def _createMenuBar(self):
         menu_bar = self.menuBar()
         self.file_menu = menu_bar.addMenu("&Open")
@@ -459,6 +926,12 @@ class MainUI(QMainWindow):
             actions.append(action)
         self.file_menu.addActions(actions)
 
+        stats = self.documents.stats()
+        self.file_menu.addSeparator()
+        action = self.file_menu.addAction(f"Кэш: {stats['documents']} книг, {stats['bytes'] / (1 << 20):.1f} МБ, "
+                                          f"попаданий {stats['hits']}, промахов {stats['misses']}")
+        action.setEnabled(False)
+
     def _open(self):
         fname = QFileDialog.getOpenFileName(self, 'Open file',
                                             self.last_directory, "Text files (*.pdf *.txt)")
@@ -467,20 +940,102 @@ class MainUI(QMainWindow):
     def open(self, filename):
         if filename:
             self.last_directory = os.path.dirname(filename)
-            try:
-                words = read.read(filename)
-                if filename in self.recent_files:
-                    self.recent_files.remove(filename)
-                elif len(self.recent_files) == self.MAX_RECENT:
-                    self.recent_files.pop()
-                self.recent_files.insert(0, filename)
-
-                save.save(self)
-                self.filename = filename
-                self.populate(words)
-                save.load_scroll_frame(self)
-            except:
-                pass
+            self.load(filename)
+
+    def restore(self, filename):
+        if filename:
+            self.load(filename, remember=False)
+        else:
+            self.populate([])
+
+    def load(self, filename, remember=True):
+        self.cancelLoad()
+        document = self.documents.take(filename)
+        if document is not None:
+            self.showDocument(filename, document, remember)
+            return
+
+        self.loader = DocumentLoader(filename)
+        self.loader.progress.connect(functools.partial(self.loadProgress, self.loader))
+        self.loader.loaded.connect(functools.partial(self.loaded, self.loader, remember))
+        self.loader.failed.connect(functools.partial(self.loadFailed, self.loader))
+        self.load_label.setText('Загрузка 0%')
+        self.load_label.setVisible(True)
+        self.loader.start()
+
+    def cancelLoad(self):
+        if self.loader is None:
+            return False
+        self.loader.requestInterruption()
+        self.loader = None
+        self.load_label.setVisible(False)
+        return True
+
+    def loadProgress(self, source, done, total):
+        if source is not self.loader:
+            return
+        self.load_label.setText(f'Загрузка {done * 100 // total if total else 100}%')
+
+    def loaded(self, source, remember, words):
+        if source is not self.loader:
+            return
+        self.loader = None
+        self.load_label.setVisible(False)
+        self.showDocument(source.filename, Document(words), remember)
+
+    def showDocument(self, filename, document, remember):
+        if remember:
+            if filename in self.recent_files:
+                self.recent_files.remove(filename)
+            elif len(self.recent_files) == self.MAX_RECENT:
+                self.recent_files.pop()
+            self.recent_files.insert(0, filename)
+            save.save(self)
+
+        main_frame = document.main_frame
+        if main_frame is None:
+            main_frame = MainFrame(document.words, self.progress_label,
+                                   save.load_scroll_state(filename, self.version) or self.defaultState())
+        self.stash(keep=filename != self.filename)
+        self.filename = filename
+        self.setMainFrame(main_frame)
+
+        if document.index is None:
+            self.indexSearch(filename, document.words)
+        else:
+            if self.indexer is not None:
+                self.indexer.requestInterruption()
+                self.indexer = None
+            self.search_dialog.setIndex(document.index)
+
+    def indexSearch(self, filename, words):
+        if self.indexer is not None:
+            self.indexer.requestInterruption()
+        self.search_dialog.setIndex(None)
+        self.indexer = SearchIndexer(filename, words)
+        self.indexer.built.connect(functools.partial(self.indexBuilt, self.indexer))
+        self.indexer.start()
+
+    def indexBuilt(self, source, index):
+        if source is self.indexer:
+            self.indexer = None
+            self.search_dialog.setIndex(index)
+
+    def showSearch(self):
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def jumpTo(self, position):
+        if self.main_frame is not None:
+            self.main_frame.scroll_frame.jump(position)
+
+    def loadFailed(self, source, message):
+        if source is not self.loader:
+            return
+        self.loader = None
+        self.load_label.setVisible(False)
+        QMessageBox.warning(self, 'Ошибка', f'Не удалось открыть {source.filename}:\n{message}')
 
     def initialize_info(self, SPEED):
         hbox = QHBoxLayout(self.info_frame)
@@ -488,15 +1043,23 @@ class MainUI(QMainWindow):
         self.speed_label = QLabel(f"Скорость = {SPEED} слов в минуту")
         self.progress_label = QLabel(f"Прогресс = 0%")
         self.font_label = QLabel(f'Шрифт = 0')
+        self.perf_label = QLabel('')
+        self.perf_label.setVisible(perf.ENABLED)
+        self.load_label = QLabel('')
+        self.load_label.setVisible(False)
 
-        for label in [self.speed_label, self.progress_label, self.font_label]:
+        for label in [self.speed_label, self.progress_label, self.load_label, self.perf_label, self.font_label]:
             label.setAlignment(Qt.AlignCenter)
             hbox.addWidget(label)
         self.info_frame.setStyleSheet('font-family: Arial')
 
     def keyPressEvent(self, event):
-        if event.key() == Qt.Key_Escape or event.key() == Qt.Key_Q:
+        if event.key() == Qt.Key_Escape and self.cancelLoad():
+            pass
+        elif event.key() == Qt.Key_Escape or event.key() == Qt.Key_Q:
             self.close()
+        elif self.main_frame is None:
+            pass
         elif event.key() in [Qt.Key_Enter, Qt.Key_Space, Qt.Key_Return]:
             self.main_frame.scroll_frame.start()
         elif event.key() == Qt.Key_Equal:
@@ -515,8 +1078,48 @@ class MainUI(QMainWindow):
             self.main_frame.scroll_frame.moveDown()
         elif event.key() == Qt.Key_Up:
             self.main_frame.scroll_frame.moveUp()
+        elif event.key() == Qt.Key_R:
+            scroll_frame = self.main_frame.scroll_frame
+            scroll_frame.setRenderer('painted' if scroll_frame.renderer == 'labels' else 'labels')
+            self.setChildrenFocusPolicy(Qt.NoFocus)
+        elif event.key() == Qt.Key_F:
+            self.showSearch()
+        elif event.key() == Qt.Key_F3:
+            self.togglePerfOverlay()
+        elif event.key() == Qt.Key_F4:
+            self.saveTrace()
         event.accept()
 
+    def saveTrace(self):
+        try:
+            path = perf.dump(time.strftime('reader-trace-%Y%m%d-%H%M%S.json'))
+        except OSError as e:
+            self.statusBar().showMessage(f'Не удалось сохранить трассу: {e}', self.STATUS_TIMEOUT)
+            return
+        self.statusBar().showMessage(f'Трасса сохранена: {os.path.abspath(path)}', self.STATUS_TIMEOUT)
+
+    def togglePerfOverlay(self):
+        perf.set_enabled(not perf.ENABLED)
+        self.perf_label.setVisible(perf.ENABLED)
+        if perf.ENABLED:
+            self.perf_timer.start(self.PERF_INTERVAL)
+        else:
+            self.perf_timer.stop()
+
+    def updatePerfOverlay(self):
+        if self.main_frame is None:
+            return
+        stats = self.main_frame.scroll_frame.pacingStats()
+        parts = [f'{stats["wpm"]:.0f} слов/мин']
+        tick = perf.recent('tick')
+        if tick is not None:
+            parts.append(f'кадр {tick["mean"] * 1000:.1f}/{tick["max"] * 1000:.1f} мс')
+        fill = perf.recent('layout')
+        if fill is not None:
+            parts.append(f'fill {fill["mean"] * 1000:.1f} мс')
+        parts.append(f'опоздание {stats["mean lateness"] * 1000:.1f} мс')
+        self.perf_label.setText(' | '.join(parts))
+
     def setChildrenFocusPolicy(self, policy):
         def recursiveSetChildFocusPolicy(parentQWidget):
             for childQWidget in parentQWidget.findChildren(QWidget):
@@ -527,6 +1130,9 @@ class MainUI(QMainWindow):
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
         save.save(self)
+        save.close()
+        loader.stop_all()
+        read.shutdown()
 
 
 def initialize():
@@ -540,13 +1146,29 @@ def initialize():
     # save.delete_save(0)
     # save.delete_save('text.txt', 0)
     ex = MainUI(screen_width, screen_height, titlebar_height)
+    filename = save.load(ex)
+    ex.show()
+    app.processEvents()
 
-    save.load(ex)
+    ex.restore(filename)
     # ex.main_frame.scroll_frame.jump(33065)
 
     sys.exit(app.exec_())
 
 
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ingest', metavar='DIRECTORY', help='tokenize every pdf and txt file into the cache and exit')
+    parser.add_argument('--workers', type=int, default=read.WORKERS)
+    parser.add_argument('--cache-size', type=int, metavar='MB', help='cache size limit, kept for later runs')
+    args = parser.parse_args()
+
+    if args.ingest:
+        ingest.ingest(args.ingest, args.workers, args.cache_size << 20 if args.cache_size else None)
+    else:
+        initialize()
+
+
 # Press the green button in the gutter to run the script.
 if __name__ == '__main__':
-    initialize()
+    main()
@@ -0,0 +1,62 @@
+from collections import OrderedDict
+
+from PyQt5.QtGui import QFont, QFontMetrics
+
+
+class WidthCache:
+    MAX_SIZE = 200000
+
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.widths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        self.family = None
+        self.size = None
+        self.font = None
+        self.metrics = None
+
+    def setFont(self, family, size):
+        size = int(size)
+        if (family, size) == (self.family, self.size):
+            return
+        self.family = family
+        self.size = size
+        self.font = QFont(family)
+        self.font.setPointSize(size)
+        self.metrics = QFontMetrics(self.font)
+
+    def width(self, text):
+        key = (self.family, self.size, text)
+        width = self.widths.get(key)
+        if width is not None:
+            self.hits += 1
+            self.widths.move_to_end(key)
+            return width
+
+        self.misses += 1
+        width = self.metrics.width(text)
+        self.widths[key] = width
+        if len(self.widths) > self.max_size:
+            self.widths.popitem(last=False)
+        return width
+
+    def measure(self, texts):
+        return [self.width(text) for text in texts]
+
+    def cached(self):
+        return {text: width for (family, size, text), width in self.widths.items()
+                if (family, size) == (self.family, self.size)}
+
+    def clear(self):
+        self.widths.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self.widths),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit rate': self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,179 @@
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+
+import read
+from wordstore import WordStore
+
+_fitz_lock = threading.Lock()
+
+
+class PageIndex:
+    def __init__(self, counts, drops, suffixes):
+        self.counts = counts
+        self.drops = drops
+        self.suffixes = suffixes
+        self.starts = array('Q', [0])
+        self.starts.extend(accumulate(counts))
+
+    @staticmethod
+    def build(pages):
+        counts = array('I')
+        drops = bytearray()
+        suffixes = []
+        owner = None
+        for i, page in enumerate(pages):
+            counts.append(0)
+            drops.append(0)
+            suffixes.append('')
+            if page is None:
+                continue
+            tokens, lead, trail = page
+            start = 0
+            if owner is not None:
+                if lead:
+                    suffixes[owner] += tokens[0]
+                    drops[i] = start = 1
+                    if trail and len(tokens) == 1:
+                        continue
+                owner = None
+            counts[i] = len(tokens) - start
+            if trail:
+                owner = i
+        return PageIndex(counts, drops, suffixes)
+
+    @classmethod
+    def from_buffer(cls, buffer, count):
+        buffer = memoryview(buffer)
+        offset = 5 * count + -5 * count % 8
+        if len(buffer) < offset:
+            raise ValueError('page index is truncated')
+        counts = array('I')
+        counts.frombytes(buffer[:4 * count])
+        if sys.byteorder != 'little':
+            counts.byteswap()
+        drops = bytearray(buffer[4 * count:5 * count])
+        return cls(counts, drops, list(WordStore.from_buffer(buffer[offset:], count)))
+
+    def chunks(self):
+        counts = array('I', self.counts)
+        if sys.byteorder != 'little':
+            counts.byteswap()
+        suffixes = WordStore.from_words(self.suffixes)
+        yield counts.tobytes()
+        yield bytes(self.drops)
+        yield bytes(-5 * len(self.counts) % 8)
+        yield suffixes.offsets_bytes()
+        yield bytes(suffixes.blob)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def page_of(self, position):
+        return bisect_right(self.starts, position) - 1
+
+    def words(self, page, text):
+        tokens = read.page_tokens(text)
+        tokens = tokens[0] if tokens is not None else []
+        if self.drops[page]:
+            tokens = tokens[1:]
+        if self.suffixes[page] and tokens:
+            tokens[-1] += self.suffixes[page]
+        return tokens
+
+
+class PagedWords:
+    lazy = True
+    MAX_PAGES = 32
+    PREFETCH = 4
+
+    def __init__(self, filename, index):
+        import fitz
+
+        self.filename = filename
+        self.index = index
+        self.doc = fitz.open(filename)
+        self.pages = OrderedDict()
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.prefetcher = ThreadPoolExecutor(1)
+
+    def __len__(self):
+        return self.index.starts[-1]
+
+    def extract(self, page):
+        with _fitz_lock:
+            text = self.doc[page].get_text()
+        return self.index.words(page, text)
+
+    def load(self, page):
+        words = self.extract(page)
+        with self.lock:
+            self.pending.discard(page)
+            self.pages[page] = words
+            self.pages.move_to_end(page)
+            while len(self.pages) > self.MAX_PAGES:
+                self.pages.popitem(last=False)
+        return words
+
+    def page(self, page, prefetch=True):
+        with self.lock:
+            words = self.pages.get(page)
+            if words is not None:
+                self.pages.move_to_end(page)
+        if words is None:
+            words = self.load(page)
+        if prefetch:
+            self.prefetch(page + 1)
+        return words
+
+    def prefetch(self, page):
+        with self.lock:
+            for i in range(page, min(page + self.PREFETCH, len(self.index))):
+                if i not in self.pages and i not in self.pending and self.index.counts[i]:
+                    self.pending.add(i)
+                    self.prefetcher.submit(self.load, i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            words = []
+            while start < stop:
+                page = self.index.page_of(start)
+                offset = self.index.starts[page]
+                words.extend(self.page(page, prefetch=False)[start - offset:stop - offset])
+                start = self.index.starts[page + 1]
+            return words
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('word index out of range')
+        page = self.index.page_of(i)
+        return self.page(page)[i - self.index.starts[page]]
+
+    def __iter__(self):
+        import fitz
+
+        with _fitz_lock:
+            doc = fitz.open(self.filename)
+        try:
+            for page in range(len(self.index)):
+                if not self.index.counts[page]:
+                    continue
+                with _fitz_lock:
+                    text = doc[page].get_text()
+                yield from self.index.words(page, text)
+        finally:
+            with _fitz_lock:
+                doc.close()
+
+    def nbytes(self):
+        with self.lock:
+            pages = list(self.pages.values())
+        return 13 * len(self.index) + sum(sys.getsizeof(word) for words in pages for word in words)
@@ -0,0 +1,79 @@
+import functools
+import json
+import os
+import time
+from collections import deque
+from contextlib import nullcontext
+
+CAPACITY = 4096
+ENABLED = os.environ.get('READER_PERF', '') not in ('', '0')
+
+_records = {}
+_null = nullcontext()
+
+
+def set_enabled(enabled):
+    global ENABLED
+    ENABLED = enabled
+
+
+def record(name, start, duration):
+    buffer = _records.get(name)
+    if buffer is None:
+        buffer = _records[name] = deque(maxlen=CAPACITY)
+    buffer.append((start, duration))
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, time.perf_counter() - self.start)
+
+
+def span(name):
+    return _Span(name) if ENABLED else _null
+
+
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(name, start, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def recent(name, count=100):
+    buffer = _records.get(name)
+    if not buffer:
+        return None
+    durations = [duration for _, duration in list(buffer)[-count:]]
+    return {'mean': sum(durations) / len(durations), 'max': max(durations), 'count': len(durations)}
+
+
+def clear():
+    _records.clear()
+
+
+def dump(path):
+    events = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': 0, 'ts': start * 1e6, 'dur': max(duration, 0) * 1e6}
+              for name, buffer in list(_records.items()) for start, duration in list(buffer)]
+    events.sort(key=lambda event: event['ts'])
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events}, f)
+    return path
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+
+FIELDS = ('position', 'highlight', 'current line', 'font size', 'width', 'speed')
+COLUMNS = ('position', 'highlight', 'current_line', 'font_size', 'width', 'speed')
+
+
+def _data_dir():
+    if os.name == 'nt':
+        return os.environ.get('APPDATA', os.path.expanduser('~'))
+    return os.environ.get('XDG_DATA_HOME', os.path.join(os.path.expanduser('~'), '.local', 'share'))
+
+
+PATH = os.path.join(_data_dir(), 'ReadingAppQt', 'progress.sqlite3')
+
+
+class ProgressStore:
+    DEBOUNCE = 2.0
+
+    def __init__(self, path=PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute(f'''CREATE TABLE IF NOT EXISTS progress (
+            filename TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            {', '.join(f'{column} INTEGER' for column in COLUMNS)},
+            PRIMARY KEY (filename, version))''')
+        self.db.commit()
+
+        self.pending = {}
+        self.batch = {}
+        self.written = {}
+        self.flushing = False
+        self.closed = False
+        self.condition = threading.Condition()
+        self.writer = threading.Thread(target=self.run, name='progress writer', daemon=True)
+        self.writer.start()
+
+    def get(self, filename, version):
+        with self.condition:
+            state = self.pending.get((filename, version)) or self.batch.get((filename, version))
+        if state is not None:
+            return dict(state)
+
+        row = self.db.execute(f'SELECT {", ".join(COLUMNS)} FROM progress WHERE filename = ? AND version = ?',
+                              (filename, version)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(FIELDS, row))
+
+    def put(self, filename, version, state):
+        state = {field: state.get(field) for field in FIELDS}
+        with self.condition:
+            if self.written.get((filename, version)) == state:
+                self.pending.pop((filename, version), None)
+                return
+            if not self.pending:
+                self.condition.notify()
+            self.pending[(filename, version)] = state
+
+    def delete(self, filename, version):
+        self.flush()
+        with self.condition:
+            self.written.pop((filename, version), None)
+        self.db.execute('DELETE FROM progress WHERE filename = ? AND version = ?', (filename, version))
+        self.db.commit()
+
+    def flush(self):
+        with self.condition:
+            self.flushing = True
+            self.condition.notify()
+            while (self.pending or self.batch) and self.writer.is_alive():
+                self.condition.wait()
+            self.flushing = False
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.writer.join()
+        self.db.close()
+
+    def run(self):
+        db = sqlite3.connect(self.path)
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.flushing and not self.closed:
+                    self.condition.wait(self.DEBOUNCE)
+                batch = self.batch = self.pending
+                self.pending = {}
+                closed = self.closed
+
+            if batch:
+                with db:
+                    db.executemany(
+                        f'INSERT OR REPLACE INTO progress (filename, version, {", ".join(COLUMNS)}) '
+                        f'VALUES ({", ".join("?" * (len(COLUMNS) + 2))})',
+                        [(filename, version, *(state[field] for field in FIELDS))
+                         for (filename, version), state in batch.items()])
+
+            with self.condition:
+                self.written.update(batch)
+                self.batch = {}
+                self.condition.notify_all()
+                if closed and not self.pending:
+                    break
+        db.close()
@@ -1,18 +1,184 @@
+import codecs
+import mmap
+import multiprocessing
+import os
 import re
-import fitz
+import threading
 
+TOKEN = re.compile(r'[\w!"#$%&\'()*+,-./:;<=>?@[\]^_`{|}~]+')
+CHUNK_SIZE = 1 << 20
 
-def read(filename):
+WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_PAGES = 64
+SPAWN_MIN_PAGES = 384
+PAGES_PER_TASK = 16
+LAZY_MIN_PAGES = 500
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+class Cancelled(Exception):
+    pass
+
+
+def _ignore_progress(done, total):
+    pass
+
+
+def tokenize(parts):
+    tail = ''
+    for part in parts:
+        text = tail + part
+        tail = ''
+        for match in TOKEN.finditer(text):
+            if match.end() == len(text):
+                tail = match.group()
+            else:
+                yield match.group()
+    if tail:
+        yield tail
+
+
+def page_tokens(text):
+    if not text:
+        return None
+    tokens = TOKEN.findall(text)
+    return tokens, bool(tokens) and text.startswith(tokens[0]), bool(tokens) and text.endswith(tokens[-1])
+
+
+def merge_pages(pages):
+    tail = None
+    for page in pages:
+        if page is None:
+            continue
+        tokens, lead, trail = page
+        if tail is not None:
+            if lead:
+                tokens[0] = tail + tokens[0]
+            else:
+                yield tail
+            tail = None
+        if trail:
+            tail = tokens.pop()
+        yield from tokens
+    if tail is not None:
+        yield tail
+
+
+def extract_pages(filename, start, stop):
+    import fitz
+
+    with fitz.open(filename) as doc:
+        return [page_tokens(doc[i].get_text()) for i in range(start, stop)]
+
+
+def iter_pages(filename, progress=_ignore_progress):
+    import fitz
+
+    with fitz.open(filename) as doc:
+        for i, page in enumerate(doc, 1):
+            yield page.get_text()
+            progress(i, doc.page_count)
+
+
+def page_count(filename):
+    import fitz
+
+    with fitz.open(filename) as doc:
+        return doc.page_count
+
+
+def parallel(workers, count):
+    if workers <= 1 or count < PARALLEL_MIN_PAGES:
+        return False
+    with _pool_lock:
+        return count >= SPAWN_MIN_PAGES or (_pool is not None and _pool_workers == workers)
+
+
+def pool(workers):
+    global _pool, _pool_workers
+    from concurrent.futures import ProcessPoolExecutor
+
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def iter_page_tokens(filename, workers=None, progress=_ignore_progress):
+    from concurrent.futures.process import BrokenProcessPool
+
+    if workers is None:
+        workers = WORKERS
+    count = page_count(filename)
+
+    if not parallel(workers, count):
+        yield from map(page_tokens, iter_pages(filename, progress))
+        return
+
+    starts = range(0, count, PAGES_PER_TASK)
+    stops = [min(start + PAGES_PER_TASK, count) for start in starts]
+    futures = []
+    try:
+        executor = pool(workers)
+        futures = [executor.submit(extract_pages, filename, start, stop) for start, stop in zip(starts, stops)]
+        for stop, future in zip(stops, futures):
+            yield from future.result()
+            progress(stop, count)
+    except BrokenProcessPool:
+        shutdown()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def iter_pdf_words(filename, workers=None, progress=_ignore_progress):
+    if workers is None:
+        workers = WORKERS
+    if not parallel(workers, page_count(filename)):
+        yield from tokenize(iter_pages(filename, progress))
+    else:
+        yield from merge_pages(iter_page_tokens(filename, workers, progress))
+
+
+def iter_chunks(filename, progress=_ignore_progress):
+    with open(filename, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            decoder = codecs.getincrementaldecoder('utf-8')()
+            for start in range(0, size, CHUNK_SIZE):
+                yield decoder.decode(mm[start:start + CHUNK_SIZE])
+                progress(min(start + CHUNK_SIZE, size), size)
+            yield decoder.decode(b'', final=True)
+
+
+def iter_words(filename, workers=None, progress=None):
     if not filename:
-        return []
+        return
+    if progress is None:
+        progress = _ignore_progress
 
     if filename.split('.')[-1] == 'pdf':
-        with fitz.open(filename) as doc:
-            text = ""
-            for page in doc:
-                text += page.get_text()
+        yield from iter_pdf_words(filename, workers, progress)
     else:
-        with open(filename, 'r', encoding='utf-8') as f:
-            text = f.read()
-    text = re.sub('[^\w!"#$%&\'()*+,-./:;<=>?@[\]^_`{|}~]+', ' ', text)
-    return text.split()
+        yield from tokenize(iter_chunks(filename, progress))
+
+
+def read(filename):
+    return list(iter_words(filename))
@@ -1,18 +1,37 @@
+from typing import TYPE_CHECKING
+
 from PyQt5.QtCore import QSettings
 
-import read
-from main import MainUI, ScrollFrame
+from progress import FIELDS, ProgressStore
+
+if TYPE_CHECKING:
+    from main import MainUI, ScrollFrame
+
+_store = None
+
+
+def progress_store():
+    global _store
+    if _store is None:
+        _store = ProgressStore()
+    return _store
+
+
+def close():
+    if _store is not None:
+        _store.close()
 
 
 def delete_save(version, filename=''):
     if filename:
         settings = QSettings('ReadingAppQt', f'{filename}_{version}')
+        progress_store().delete(filename, version)
     else:
         settings = QSettings('ReadingAppQt', f'Main_{version}')
     settings.clear()
 
 
-def save(main_ui: MainUI):
+def save(main_ui: 'MainUI'):
     settings = QSettings('ReadingAppQt', f'Main_{main_ui.version}')
     settings.setValue('saved', True)
     settings.setValue('window size', main_ui.size())
@@ -21,59 +40,60 @@ def save(main_ui: MainUI):
     settings.setValue('last filename', main_ui.filename)
     settings.setValue('recent files', main_ui.recent_files)
 
-    settings = QSettings('ReadingAppQt', f'{main_ui.filename}_{main_ui.version}')
-    settings.setValue('saved', True)
-    save_scroll_frame(main_ui.main_frame.scroll_frame, settings)
+    save_progress(main_ui)
+    progress_store().flush()
+
 
+def save_progress(main_ui: 'MainUI'):
+    if main_ui.filename and main_ui.main_frame is not None:
+        progress_store().put(main_ui.filename, main_ui.version, save_scroll_frame(main_ui.main_frame.scroll_frame))
 
-def save_scroll_frame(scroll_frame: ScrollFrame, settings: QSettings):
-    settings.setValue('font size', scroll_frame.font_size)
-    settings.setValue('speed', scroll_frame.speed)
-    settings.setValue('current line', scroll_frame.current_line)
-    settings.setValue('width', scroll_frame.frames[0].width)
 
-    settings.setValue('position', scroll_frame.frames[scroll_frame.current_line].begin)
-    settings.setValue('highlight', scroll_frame.frames[scroll_frame.current_line].highlight_position)
+def save_scroll_frame(scroll_frame: 'ScrollFrame'):
+    return {
+        'font size': scroll_frame.font_size,
+        'speed': scroll_frame.speed,
+        'current line': scroll_frame.current_line,
+        'width': scroll_frame.frames[0].width,
+        'position': scroll_frame.toSource(scroll_frame.frames[scroll_frame.current_line].begin)[0],
+        'highlight': scroll_frame.frames[scroll_frame.current_line].highlight_position,
+    }
 
 
-def load(main_ui: MainUI):
+def load(main_ui: 'MainUI'):
     settings = QSettings('ReadingAppQt', f'Main_{main_ui.version}')
     if not settings.contains('saved'):
-        return
+        return ''
     main_ui.last_directory = settings.value('last directory')
-    main_ui.filename = settings.value('last filename')
     main_ui.recent_files = settings.value('recent files')
 
     main_ui.resize(settings.value('window size'))
     main_ui.move(settings.value('window position'))
 
-    load_scroll_frame(main_ui)
+    return settings.value('last filename')
 
 
-def load_scroll_frame(main_ui: MainUI):
-    settings = QSettings('ReadingAppQt', f'{main_ui.filename}_{main_ui.version}')
-    if not settings.contains('saved'):
-        return
+def load_scroll_state(filename, version):
+    state = progress_store().get(filename, version)
+    if state is None:
+        state = migrate(filename, version)
+    if state is None:
+        return None
 
     print('Loaded')
-    scroll_frame = main_ui.main_frame.scroll_frame
-
-    scroll_frame.speed = settings.value('speed')
-    main_ui.speed_label.setText(f"Скорость = {scroll_frame.speed} слов в минуту")
-    main_ui.font_label.setText(f'Шрифт = {settings.value("font size")}')
-
-    words = read.read(main_ui.filename)
-    main_ui.populate(words)
-    scroll_frame = main_ui.main_frame.scroll_frame
-
-    scroll_frame.font_size = settings.value('font size')
-    scroll_frame.setStyleSheet(f'font-size: {scroll_frame.font_size}pt;'
-                               f'font-family: {scroll_frame.font_family};')
-
-    scroll_frame.frames[scroll_frame.current_line].setStyleSheet('')
-    scroll_frame.current_line = settings.value('current line')
-    if words:
-        scroll_frame.frames[scroll_frame.current_line].setStyleSheet(scroll_frame.highlight_line_style)
-    for frame in scroll_frame.frames:
-        frame.width = settings.value('width')
-    scroll_frame.jump(settings.value('position'), settings.value('highlight'))
+    return state
+
+
+def migrate(filename, version):
+    settings = QSettings('ReadingAppQt', f'{filename}_{version}')
+    if not settings.contains('saved'):
+        return None
+
+    state = {}
+    for field in FIELDS:
+        value = settings.value(field)
+        state[field] = int(value) if value is not None else None
+    progress_store().put(filename, version, state)
+    progress_store().flush()
+    settings.clear()
+    return state
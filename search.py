@@ -0,0 +1,145 @@
+import heapq
+import string
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, islice
+
+import read
+from wordstore import WordStore
+
+CHECK_INTERVAL = 1 << 16
+
+
+def normalize(word):
+    return word.strip(string.punctuation).lower()
+
+
+def snippet(words, position, context):
+    return ' '.join(words[max(position - context, 0):position + context])
+
+
+def _little_endian(values):
+    if sys.byteorder == 'little':
+        return bytes(values)
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values.tobytes()
+
+
+def _from_little_endian(buffer, typecode):
+    if sys.byteorder == 'little':
+        return buffer.cast(typecode)
+    values = array(typecode)
+    values.frombytes(buffer)
+    values.byteswap()
+    return values
+
+
+class SearchIndex:
+    def __init__(self, words, terms, starts, positions, ids):
+        self.words = words
+        self.terms = terms
+        self.starts = starts
+        self.positions = positions
+        self.ids = ids
+
+    @staticmethod
+    def build(words, interrupted=lambda: False):
+        lookup = {}
+        ids = array('I')
+        for i, word in enumerate(words):
+            if i % CHECK_INTERVAL == 0 and interrupted():
+                return None
+            ids.append(lookup.setdefault(normalize(word), len(lookup)))
+
+        terms = sorted(lookup)
+        rank = array('I', bytes(4 * len(terms)))
+        for i, term in enumerate(terms):
+            rank[lookup[term]] = i
+        del lookup
+        if interrupted():
+            return None
+
+        counts = array('Q', bytes(8 * len(terms)))
+        for i in range(len(ids)):
+            ids[i] = term = rank[ids[i]]
+            counts[term] += 1
+        starts = array('Q', [0])
+        starts.extend(accumulate(counts))
+        if interrupted():
+            return None
+
+        del counts
+        positions = array('I', bytes(4 * len(ids)))
+        free = starts[:-1]
+        for position, term in enumerate(ids):
+            positions[free[term]] = position
+            free[term] += 1
+        return SearchIndex(words, terms, starts, positions, ids)
+
+    @classmethod
+    def from_buffer(cls, words, buffer, count):
+        buffer = memoryview(buffer)
+        size = 8 * (count + 1)
+        if len(buffer) < size:
+            raise ValueError('search index is truncated')
+        starts = _from_little_endian(buffer[:size], 'Q')
+        middle = size + 4 * starts[-1]
+        end = middle + 4 * starts[-1]
+        if len(buffer) < end:
+            raise ValueError('search index is truncated')
+        positions = _from_little_endian(buffer[size:middle], 'I')
+        ids = _from_little_endian(buffer[middle:end], 'I')
+        return cls(words, WordStore.from_buffer(buffer[end:], count), starts, positions, ids)
+
+    def chunks(self):
+        terms = self.terms if isinstance(self.terms, WordStore) else WordStore.from_words(self.terms)
+        yield _little_endian(self.starts)
+        yield _little_endian(self.positions)
+        yield _little_endian(self.ids)
+        yield terms.offsets_bytes()
+        yield bytes(terms.blob)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def term_range(self, term, prefix=False):
+        begin = bisect_left(self.terms, term)
+        if prefix:
+            return begin, bisect_left(self.terms, term + '\U0010ffff', begin)
+        if begin < len(self.terms) and self.terms[begin] == term:
+            return begin, begin + 1
+        return begin, begin
+
+    def count(self, begin, end):
+        return self.starts[end] - self.starts[begin]
+
+    def occurrences(self, begin, end):
+        if end - begin == 1:
+            return self.positions[self.starts[begin]:self.starts[end]]
+        return heapq.merge(*(self.positions[self.starts[i]:self.starts[i + 1]] for i in range(begin, end)))
+
+    def matches(self, begin, end, position):
+        return position < len(self.ids) and begin <= self.ids[position] < end
+
+    def find(self, query, limit=100):
+        terms = [normalize(token) for token in read.TOKEN.findall(query)]
+        terms = [term for term in terms if term]
+        if not terms:
+            return 0, []
+
+        ranges = [self.term_range(term, j == len(terms) - 1) for j, term in enumerate(terms)]
+        if len(terms) == 1:
+            begin, end = ranges[0]
+            return self.count(begin, end), list(islice(self.occurrences(begin, end), limit))
+
+        order = sorted(range(len(terms)), key=lambda j: self.count(*ranges[j]))
+        first = order[0]
+        candidates = [position - first for position in self.occurrences(*ranges[first]) if position >= first]
+        for j in order[1:]:
+            if not candidates:
+                break
+            begin, end = ranges[j]
+            candidates = [position for position in candidates if self.matches(begin, end, position + j)]
+        return len(candidates), candidates[:limit]
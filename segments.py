@@ -0,0 +1,92 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+HYPHEN = '-'
+CHECK_INTERVAL = 1 << 16
+
+
+def split_word(word, limit, measure):
+    pieces = []
+    while len(word) > 1 and measure(word + ' ') > limit:
+        low, high = 1, len(word) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if measure(word[:middle] + HYPHEN + ' ') <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        pieces.append(word[:low] + HYPHEN)
+        word = word[low:]
+    pieces.append(word)
+    return pieces
+
+
+class SegmentView:
+    def __init__(self, words, split, pieces):
+        self.words = words
+        self.split = split
+        self.pieces = pieces
+
+        self.extra = array('q', [0])
+        self.starts = array('q')
+        for i, word_pieces in zip(split, pieces):
+            self.starts.append(i + self.extra[-1])
+            self.extra.append(self.extra[-1] + len(word_pieces) - 1)
+
+    def __len__(self):
+        return len(self.words) + self.extra[-1]
+
+    def to_display(self, position, piece=0):
+        k = bisect_left(self.split, position)
+        if k < len(self.split) and self.split[k] == position:
+            return self.starts[k] + min(piece, len(self.pieces[k]) - 1)
+        return position + self.extra[k]
+
+    def to_source(self, position):
+        k = bisect_right(self.starts, position) - 1
+        if k >= 0 and position < self.starts[k] + len(self.pieces[k]):
+            return self.split[k], position - self.starts[k]
+        return position - self.extra[k + 1], 0
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+            if i < 0:
+                raise IndexError('word index out of range')
+        k = bisect_right(self.starts, i) - 1
+        if k >= 0 and i < self.starts[k] + len(self.pieces[k]):
+            return self.pieces[k][i - self.starts[k]]
+        return self.words[i - self.extra[k + 1]]
+
+    def __iter__(self):
+        words = iter(self.words)
+        position = 0
+        for i, pieces in zip(self.split, self.pieces):
+            yield from islice(words, i - position)
+            next(words)
+            yield from pieces
+            position = i + 1
+        yield from words
+
+
+def segment(words, widths, limit, measure, interrupted=lambda: False):
+    long_words = {}
+    for word in [word for word, width in widths.items() if width > limit and len(word) > 1]:
+        pieces = long_words[word] = split_word(word, limit, measure)
+        for piece in pieces:
+            widths[piece] = measure(piece + ' ')
+    if not long_words:
+        return words
+
+    split = array('q')
+    pieces = []
+    for i, word in enumerate(words):
+        if i % CHECK_INTERVAL == 0 and interrupted():
+            return None
+        if word in long_words:
+            split.append(i)
+            pieces.append(long_words[word])
+    return SegmentView(words, split, pieces)
@@ -0,0 +1,53 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+_home = tempfile.mkdtemp(prefix='reader-tests-')
+for name in ['XDG_CACHE_HOME', 'XDG_DATA_HOME', 'XDG_CONFIG_HOME', 'LOCALAPPDATA', 'APPDATA']:
+    os.environ[name] = os.path.join(_home, name.lower())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def wait(qapp):
+    def wait(condition, timeout=30):
+        deadline = time.perf_counter() + timeout
+        while not condition():
+            assert time.perf_counter() < deadline, 'timed out waiting for the event loop'
+            qapp.processEvents()
+            time.sleep(0.001)
+
+    return wait
+
+
+@pytest.fixture
+def reader(qapp, monkeypatch):
+    main = pytest.importorskip('main')
+    frames = []
+
+    def build(words, renderer='labels', width=800, height=1000):
+        monkeypatch.setenv('READER_RENDERER', renderer)
+        frame = main.MainFrame(words, main.QLabel(), {'speed': main.MainUI.DEFAULT_SPEED,
+                                                      'font size': main.ScrollFrame.DEFAULT_FONT_SIZE})
+        frame.resize(width, height)
+        frame.show()
+        qapp.processEvents()
+        frame.applySize()
+        frames.append(frame)
+        return frame
+
+    yield build
+    for frame in frames:
+        frame.deleteLater()
+    qapp.processEvents()
+    main.loader.stop_all()
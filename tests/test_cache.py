@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+import cache
+from paged import PageIndex
+from search import SearchIndex
+from wordstore import WordStore
+
+WORDS = ['alpha', 'beta', 'gamma', 'дельта', 'alpha']
+
+
+@pytest.fixture
+def book(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    filename = tmp_path / 'book.txt'
+    filename.write_text(' '.join(WORDS), encoding='utf-8')
+    return str(filename)
+
+
+def truncate(path, size):
+    with open(path, 'r+b') as f:
+        f.truncate(size)
+
+
+def test_roundtrip(book):
+    assert list(cache.read_words(book)) == WORDS
+    assert list(cache.load(book)) == WORDS
+
+
+@pytest.mark.parametrize('extra', [0, 13, 8 * len(WORDS) + 3])
+def test_truncated_token_cache_is_rebuilt(book, extra):
+    cache.read_words(book)
+    truncate(cache.cache_path(book), cache.HEADER.size + extra)
+    assert cache.load(book) is None
+    assert list(cache.read_words(book)) == WORDS
+    assert list(cache.load(book)) == WORDS
+
+
+def test_truncated_search_index_is_ignored(book):
+    words = cache.read_words(book)
+    cache.store_index(book, SearchIndex.build(words))
+    assert cache.load_index(book, words).find('alpha') == (2, [0, 4])
+    assert cache.load_index(book, words).find('gamma дел') == (1, [2])
+    for size in [os.path.getsize(cache.cache_path(book, '.idx')) - 3, cache.HEADER.size + 13]:
+        truncate(cache.cache_path(book, '.idx'), size)
+        assert cache.load_index(book, words) is None
+
+
+def test_truncated_page_index_is_ignored(book):
+    index = PageIndex.build([(['a', 'b'], True, True), (['c'], True, False)])
+    cache.store_pages(book, index)
+    assert list(cache.load_pages(book).counts) == [2, 0]
+    truncate(cache.cache_path(book, '.pgx'), cache.HEADER.size + 5)
+    assert cache.load_pages(book) is None
+
+
+def test_from_buffer_rejects_short_buffers():
+    store = WordStore.from_words(WORDS)
+    data = store.offsets_bytes() + bytes(store.blob)
+    assert list(WordStore.from_buffer(data, len(WORDS))) == WORDS
+    for size in [0, 13, len(data) - 1]:
+        with pytest.raises(ValueError):
+            WordStore.from_buffer(data[:size], len(WORDS))
+
+
+def test_stored_max_size_applies_to_later_writes(book, tmp_path):
+    assert cache.load_max_size() == cache.MAX_SIZE
+    cache.read_words(book)
+    size = os.path.getsize(cache.cache_path(book))
+    cache.store_max_size(size * 3 // 2)
+    assert cache.load_max_size() == size * 3 // 2
+
+    other = tmp_path / 'other.txt'
+    other.write_text(' '.join(reversed(WORDS)), encoding='utf-8')
+    os.utime(cache.cache_path(book), (0, 0))
+    cache.read_words(str(other))
+    assert not os.path.exists(cache.cache_path(book))
+    assert list(cache.load(str(other))) == WORDS[::-1]
+
+
+def test_evict_skips_entries_removed_concurrently(book, monkeypatch):
+    cache.read_words(book)
+    removed = cache.cache_path(book)
+    scandir = os.scandir
+
+    def racing_scandir(path):
+        entries = list(scandir(path))
+        os.remove(removed)
+        return iter(entries)
+
+    monkeypatch.setattr(os, 'scandir', racing_scandir)
+    cache.evict(0)
+    assert not os.path.exists(removed)
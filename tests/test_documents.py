@@ -0,0 +1,86 @@
+import os
+import random
+
+from documents import Document, DocumentCache
+from search import SearchIndex
+
+
+class FakeDocument(Document):
+    def __init__(self, size):
+        super().__init__([])
+        self.size = size
+        self.released = False
+
+    def nbytes(self):
+        return self.size
+
+    def release(self):
+        self.released = True
+
+
+def make_files(tmp_path, count):
+    filenames = []
+    for i in range(count):
+        filename = tmp_path / f'{i}.txt'
+        filename.write_text(str(i))
+        filenames.append(str(filename))
+    return filenames
+
+
+def test_lru_eviction_by_byte_budget(tmp_path):
+    rng = random.Random(7)
+    filenames = make_files(tmp_path, 8)
+    cache = DocumentCache(max_bytes=100)
+    model = []
+    for _ in range(2000):
+        filename = rng.choice(filenames)
+        if rng.random() < 0.5:
+            document = FakeDocument(rng.randint(1, 60))
+            cache.put(filename, document)
+            model = [(name, doc) for name, doc in model if name != filename] + [(filename, document)]
+            while model and sum(doc.size for _, doc in model) > 100:
+                model.pop(0)
+        else:
+            document = cache.take(filename)
+            expected = dict(model).get(filename)
+            assert document is expected
+            model = [(name, doc) for name, doc in model if name != filename]
+        assert list(cache.documents) == [name for name, _ in model]
+        assert cache.nbytes() == sum(doc.size for _, doc in model) <= 100
+
+
+def test_evicted_documents_are_released(tmp_path):
+    first, second = make_files(tmp_path, 2)
+    cache = DocumentCache(max_bytes=10)
+    old, new = FakeDocument(8), FakeDocument(8)
+    cache.put(first, old)
+    cache.put(second, new)
+    assert old.released and not new.released
+    assert cache.take(first) is None
+
+
+def test_changed_file_is_dropped(tmp_path):
+    filename, = make_files(tmp_path, 1)
+    cache = DocumentCache()
+    document = FakeDocument(1)
+    cache.put(filename, document)
+    with open(filename, 'a') as f:
+        f.write('more')
+    assert cache.take(filename) is None
+    assert document.released
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    document = FakeDocument(1)
+    cache.put(filename, document)
+    stat = os.stat(filename)
+    os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert cache.take(filename) is None
+    assert document.released
+
+
+def test_nbytes_counts_index_arrays():
+    words = ['alpha', 'beta', 'alpha']
+    index = SearchIndex.build(words)
+    document = Document(words, index=index)
+    expected = 8 * len(index.starts) + 4 * len(index.positions) + 4 * len(index.ids)
+    assert document.nbytes() == Document(words).nbytes() + expected + Document(index.terms).nbytes()
@@ -0,0 +1,57 @@
+import pytest
+
+
+def build_index(wait, words, known=None):
+    layout = pytest.importorskip('layout')
+    indexes = []
+    indexer = layout.LineIndexer(words, 'Verdana', 15, 400, known)
+    indexer.built.connect(indexes.append)
+    indexer.start()
+    wait(lambda: indexes)
+    indexer.wait()
+    return indexes[0]
+
+
+def test_line_indexer_uses_known_widths(qapp, wait):
+    from metrics import WidthCache
+
+    words = [f'word{i % 13}' for i in range(2000)]
+    widths = WidthCache()
+    widths.setFont('Verdana', 15)
+    widths.measure(word + ' ' for word in set(words))
+
+    measured = build_index(wait, words)
+    seeded = build_index(wait, words, widths.cached())
+    assert list(seeded.starts) == list(measured.starts)
+
+    wide = build_index(wait, words, {'word0 ': 300})
+    assert wide.view is words
+    assert len(wide) > len(measured)
+
+
+def test_width_cache_stats_and_clear(qapp):
+    from metrics import WidthCache
+
+    widths = WidthCache()
+    widths.setFont('Verdana', 15)
+    widths.measure(['a ', 'b ', 'a '])
+    assert widths.stats() == {'size': 2, 'hits': 1, 'misses': 2, 'hit rate': 1 / 3}
+    assert set(widths.cached()) == {'a ', 'b '}
+    widths.setFont('Verdana', 20)
+    assert widths.cached() == {}
+    widths.clear()
+    assert widths.stats()['size'] == 0
+
+
+def test_stop_all_stops_line_indexers(qapp):
+    layout = pytest.importorskip('layout')
+    import loader
+
+    indexes = []
+    indexer = layout.LineIndexer([f'word{i}' for i in range(200000)], 'Verdana', 15, 400)
+    indexer.built.connect(indexes.append)
+    indexer.start()
+    loader.stop_all()
+    qapp.processEvents()
+    assert indexer.isFinished()
+    assert indexes == []
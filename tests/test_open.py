@@ -0,0 +1,41 @@
+import pytest
+
+
+def test_restore_and_reopen_parse_and_build_once(qapp, wait, tmp_path, monkeypatch):
+    main = pytest.importorskip('main')
+    import cache
+    import read
+
+    monkeypatch.setattr(cache, 'CACHE_DIR', str(tmp_path / 'cache'))
+    filename = tmp_path / 'book.txt'
+    filename.write_text('one two three ' * 1000, encoding='utf-8')
+
+    parses = []
+    iter_words = read.iter_words
+    monkeypatch.setattr(read, 'iter_words', lambda *args, **kwargs: parses.append(args) or iter_words(*args, **kwargs))
+
+    builds = []
+    init = main.MainFrame.__init__
+
+    def counting_init(self, *args, **kwargs):
+        builds.append(self)
+        init(self, *args, **kwargs)
+
+    monkeypatch.setattr(main.MainFrame, '__init__', counting_init)
+
+    window = main.MainUI(1200, 900, 40)
+    window.show()
+    try:
+        window.restore(str(filename))
+        wait(lambda: window.main_frame is not None)
+        assert len(parses) == 1
+        assert len(builds) == 1
+        assert window.main_frame.scroll_frame.words[:3] == ['one', 'two', 'three']
+
+        window.open(str(filename))
+        wait(lambda: window.loader is None)
+        assert len(parses) == 1
+        assert len(builds) == 2
+    finally:
+        window.hide()
+        main.loader.stop_all()
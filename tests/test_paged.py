@@ -0,0 +1,38 @@
+import random
+import sys
+import types
+
+import read
+from paged import PageIndex, PagedWords
+from test_read import old_read, random_text
+
+
+class FakePage:
+    def __init__(self, text):
+        self.text = text
+
+    def get_text(self):
+        return self.text
+
+
+class FakeDocument(list):
+    def close(self):
+        pass
+
+
+def test_paged_words_match_old_read(monkeypatch):
+    rng = random.Random(6)
+    pages = [random_text(rng, rng.randint(0, 40)) for _ in range(60)]
+    monkeypatch.setitem(sys.modules, 'fitz', types.SimpleNamespace(
+        open=lambda filename: FakeDocument(map(FakePage, pages))))
+    words = PagedWords('book.pdf', PageIndex.build(map(read.page_tokens, pages)))
+    expected = old_read(''.join(pages))
+    try:
+        assert len(words) == len(expected)
+        assert list(words) == expected
+        assert [words[i] for i in range(len(words))] == expected
+        for _ in range(200):
+            start, stop = sorted(rng.randrange(len(words) + 1) for _ in range(2))
+            assert words[start:stop] == expected[start:stop]
+    finally:
+        words.prefetcher.shutdown()
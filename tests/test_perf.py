@@ -0,0 +1,47 @@
+import json
+import sys
+import threading
+
+import pytest
+
+import perf
+
+
+def test_dump_while_other_threads_record(tmp_path):
+    perf.clear()
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def record():
+        for i in range(20000):
+            perf.record(f'span {i}', i, 0.001)
+
+    thread = threading.Thread(target=record)
+    thread.start()
+    try:
+        while thread.is_alive():
+            perf.dump(str(tmp_path / 'trace.json'))
+    finally:
+        thread.join()
+        sys.setswitchinterval(interval)
+    perf.dump(str(tmp_path / 'trace.json'))
+    perf.clear()
+    with open(tmp_path / 'trace.json') as f:
+        assert len(json.load(f)['traceEvents']) == 20000
+
+
+def test_trace_path_is_shown_in_the_status_bar(qapp, tmp_path, monkeypatch):
+    main = pytest.importorskip('main')
+    monkeypatch.chdir(tmp_path)
+    perf.record('tick', 0, 0.001)
+    window = main.MainUI(1200, 900, 40)
+    try:
+        window.saveTrace()
+        message = window.statusBar().currentMessage()
+        path = message.split(': ', 1)[1]
+        assert path.startswith(str(tmp_path))
+        with open(path) as f:
+            assert json.load(f)['traceEvents']
+    finally:
+        perf.clear()
+        window.hide()
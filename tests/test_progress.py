@@ -0,0 +1,104 @@
+import random
+import sqlite3
+
+import pytest
+
+from progress import FIELDS, ProgressStore
+
+
+def stored(path):
+    with sqlite3.connect(path) as db:
+        return {(filename, version): dict(zip(FIELDS, values))
+                for filename, version, *values in db.execute('SELECT * FROM progress')}
+
+
+def state(rng):
+    return {field: rng.randrange(1000) for field in FIELDS}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'progress.sqlite3')
+
+
+def test_puts_are_debounced_and_batched(path, monkeypatch):
+    monkeypatch.setattr(ProgressStore, 'DEBOUNCE', 30)
+    rng = random.Random(8)
+    store = ProgressStore(path)
+    try:
+        expected = {}
+        for _ in range(500):
+            key = (f'book{rng.randrange(20)}.pdf', 0)
+            expected[key] = state(rng)
+            store.put(*key, expected[key])
+        assert stored(path) == {}
+        assert all(store.get(*key) == value for key, value in expected.items())
+
+        store.flush()
+        assert stored(path) == expected
+    finally:
+        store.close()
+
+
+def test_unchanged_state_is_not_queued(path):
+    store = ProgressStore(path)
+    try:
+        store.put('book.pdf', 0, dict.fromkeys(FIELDS, 1))
+        store.flush()
+        store.put('book.pdf', 0, dict.fromkeys(FIELDS, 1))
+        assert store.pending == {}
+    finally:
+        store.close()
+
+
+def test_matches_dict_model_across_reopen(path, monkeypatch):
+    monkeypatch.setattr(ProgressStore, 'DEBOUNCE', 0.001)
+    rng = random.Random(9)
+    model = {}
+    for _ in range(5):
+        store = ProgressStore(path)
+        for _ in range(200):
+            key = (f'book{rng.randrange(10)}.pdf', rng.randrange(2))
+            action = rng.random()
+            if action < 0.6:
+                model[key] = state(rng)
+                store.put(*key, model[key])
+            elif action < 0.7:
+                model.pop(key, None)
+                store.delete(*key)
+            elif action < 0.8:
+                store.flush()
+            else:
+                assert store.get(*key) == model.get(key)
+        store.close()
+        assert stored(path) == model
+
+
+def test_close_writes_pending_state(path, monkeypatch):
+    monkeypatch.setattr(ProgressStore, 'DEBOUNCE', 30)
+    store = ProgressStore(path)
+    store.put('book.pdf', 0, dict.fromkeys(FIELDS, 2))
+    store.close()
+    assert stored(path) == {('book.pdf', 0): dict.fromkeys(FIELDS, 2)}
+
+
+def test_migrates_qsettings_state(qapp, path, monkeypatch):
+    QtCore = pytest.importorskip('PyQt5.QtCore')
+    import save
+
+    store = ProgressStore(path)
+    monkeypatch.setattr(save, '_store', store)
+    settings = QtCore.QSettings('ReadingAppQt', 'migrated.pdf_0')
+    settings.setValue('saved', True)
+    for i, field in enumerate(FIELDS):
+        settings.setValue(field, str(i + 10))
+    settings.sync()
+
+    expected = {field: i + 10 for i, field in enumerate(FIELDS)}
+    try:
+        assert save.load_scroll_state('migrated.pdf', 0) == expected
+        assert not QtCore.QSettings('ReadingAppQt', 'migrated.pdf_0').contains('saved')
+        assert stored(path)[('migrated.pdf', 0)] == expected
+        assert save.load_scroll_state('migrated.pdf', 0) == expected
+    finally:
+        store.close()
@@ -0,0 +1,98 @@
+import random
+import re
+
+import pytest
+
+import read
+from paged import PageIndex
+
+OLD_SEPARATOR = re.compile('[^\\w!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~]+')
+ALPHABET = ['a', 'b', 'Z', '7', '_', 'é', 'ж', 'ß', '中', '😀', '.', ',', '-', '"', ' ', '  ', '\n', '\t', ' ', '—']
+
+
+def old_read(text):
+    return OLD_SEPARATOR.sub(' ', text).split()
+
+
+def random_text(rng, size):
+    return ''.join(rng.choice(ALPHABET) for _ in range(size))
+
+
+def random_parts(rng, text):
+    cuts = sorted(rng.randrange(len(text) + 1) for _ in range(rng.randint(0, 6)))
+    return [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+
+
+def test_tokenize_matches_old_read():
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = random_text(rng, rng.randint(0, 40))
+        assert list(read.tokenize(random_parts(rng, text))) == old_read(text)
+
+
+def test_read_text_file_matches_old_read(tmp_path):
+    rng = random.Random(2)
+    filename = tmp_path / 'book.txt'
+    for _ in range(200):
+        text = random_text(rng, rng.randint(0, 200))
+        filename.write_text(text, encoding='utf-8')
+        with open(filename, encoding='utf-8') as f:
+            assert read.read(str(filename)) == old_read(f.read())
+
+
+def test_read_empty_filename():
+    assert read.read('') == []
+
+
+def test_chunk_boundaries_inside_multibyte_characters(tmp_path, monkeypatch):
+    rng = random.Random(3)
+    filename = tmp_path / 'book.txt'
+    for chunk_size in [1, 2, 3, 5, 7]:
+        monkeypatch.setattr(read, 'CHUNK_SIZE', chunk_size)
+        for _ in range(100):
+            text = random_text(rng, rng.randint(0, 60))
+            filename.write_bytes(text.encode('utf-8'))
+            assert ''.join(read.iter_chunks(str(filename))) == text
+            assert read.read(str(filename)) == old_read(text)
+
+
+def test_merge_pages_matches_old_read():
+    rng = random.Random(4)
+    for _ in range(2000):
+        pages = [random_text(rng, rng.randint(0, 12)) for _ in range(rng.randint(1, 8))]
+        assert list(read.merge_pages(map(read.page_tokens, pages))) == old_read(''.join(pages))
+
+
+def test_page_index_matches_old_read():
+    rng = random.Random(5)
+    for _ in range(2000):
+        pages = [random_text(rng, rng.randint(0, 12)) for _ in range(rng.randint(1, 8))]
+        index = PageIndex.build(map(read.page_tokens, pages))
+        words = [word for page, text in enumerate(pages) for word in index.words(page, text)]
+        assert words == old_read(''.join(pages))
+        assert len(words) == index.starts[-1]
+
+
+def test_parallel_pdf_reuses_one_pool(tmp_path, monkeypatch):
+    pytest.importorskip('fitz')
+    import bench
+
+    filename = str(tmp_path / 'book.pdf')
+    bench.synthetic_pdf(filename, 40)
+    expected = read.read(filename)
+    monkeypatch.setattr(read, 'PARALLEL_MIN_PAGES', 0)
+    monkeypatch.setattr(read, 'SPAWN_MIN_PAGES', 0)
+    try:
+        assert list(read.iter_words(filename, 2)) == expected
+        pool = read._pool
+        assert list(read.iter_words(filename, 2)) == expected
+        assert read._pool is pool
+    finally:
+        read.shutdown()
+
+
+def test_cold_pool_waits_for_large_documents(monkeypatch):
+    monkeypatch.setattr(read, '_pool', None)
+    assert not read.parallel(4, read.SPAWN_MIN_PAGES - 1)
+    assert read.parallel(4, read.SPAWN_MIN_PAGES)
+    assert not read.parallel(1, read.SPAWN_MIN_PAGES)
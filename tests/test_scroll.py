@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+import bench
+
+
+def synthetic_words(count):
+    return [f'word{i % 97}' + ',' * (i % 3) for i in range(count)]
+
+
+def advance(qapp, scroll_frame, count):
+    words = len(scroll_frame.words)
+    for i in range(count):
+        if scroll_frame.frames[scroll_frame.current_line].begin >= words - 500:
+            scroll_frame.jump(0)
+        scroll_frame.moveDown()
+        if i % 1000 == 0:
+            qapp.processEvents()
+    qapp.processEvents()
+
+
+def test_label_pool_keeps_widgets_and_memory_flat(qapp, wait, reader):
+    from PyQt5.QtWidgets import QWidget
+
+    frame = reader(synthetic_words(20000))
+    scroll_frame = frame.scroll_frame
+    wait(lambda: scroll_frame.lineIndex() is not None)
+
+    index = scroll_frame.lineIndex()
+    longest = max(index.end(line) - index.start(line) for line in range(len(index)))
+
+    def pooled():
+        return sum(len(line.pool) for line in scroll_frame.frames)
+
+    advance(qapp, scroll_frame, 3000)
+    widgets = len(frame.findChildren(QWidget)) - pooled()
+    memory = bench.rss()
+
+    advance(qapp, scroll_frame, 100000)
+    assert len(frame.findChildren(QWidget)) - pooled() == widgets
+    assert pooled() <= len(scroll_frame.frames) * longest
+    assert bench.rss() - memory < 16 << 20
+
+
+@pytest.mark.parametrize('renderer', ['labels', 'painted'])
+def test_scroll_step_renders_one_line(qapp, wait, reader, monkeypatch, renderer):
+    main = pytest.importorskip('main')
+    frame = reader(synthetic_words(20000), renderer)
+    scroll_frame = frame.scroll_frame
+    wait(lambda: scroll_frame.lineIndex() is not None)
+    for _ in range(scroll_frame.highlight_line + 1):
+        scroll_frame.moveDown()
+
+    renders = []
+    populate = main.RENDERERS[renderer].populate
+    monkeypatch.setattr(main.RENDERERS[renderer], 'populate',
+                        lambda self, *args, **kwargs: renders.append(self) or populate(self, *args, **kwargs))
+
+    for move in [scroll_frame.moveDown] * 50 + [scroll_frame.moveUp] * 20:
+        renders.clear()
+        move()
+        assert len(renders) == 1
+
+
+class LazyWords(list):
+    lazy = True
+
+
+def count_renders(main, monkeypatch, renderer='labels'):
+    renders = []
+    populate = main.RENDERERS[renderer].populate
+    monkeypatch.setattr(main.RENDERERS[renderer], 'populate',
+                        lambda self, *args, **kwargs: renders.append(self) or populate(self, *args, **kwargs))
+    return renders
+
+
+def test_resize_breaks_lines_once_when_index_arrives(qapp, wait, reader, monkeypatch):
+    main = pytest.importorskip('main')
+    frame = reader(synthetic_words(20000))
+    scroll_frame = frame.scroll_frame
+    wait(lambda: scroll_frame.lineIndex() is not None)
+    current = scroll_frame.frames[scroll_frame.current_line]
+    before = current.begin, current.end
+
+    renders = count_renders(main, monkeypatch)
+    frame.resize(600, 1000)
+    frame.applySize()
+    assert renders == []
+    assert (current.begin, current.end) == before
+
+    wait(lambda: scroll_frame.indexer is None)
+    qapp.processEvents()
+    assert scroll_frame.lineIndex() is not None
+    assert len(renders) == len(set(renders)) == len(scroll_frame.frames)
+
+
+def test_resize_relays_lazy_documents_immediately(qapp, reader, monkeypatch):
+    main = pytest.importorskip('main')
+    frame = reader(LazyWords(synthetic_words(2000)))
+    scroll_frame = frame.scroll_frame
+
+    renders = count_renders(main, monkeypatch)
+    frame.resize(600, 1000)
+    frame.applySize()
+    assert len(renders) == len(scroll_frame.frames)
+    assert scroll_frame.indexer is None
+
+
+def test_pacing_stats_stop_while_paused(qapp, wait, reader):
+    frame = reader(synthetic_words(2000))
+    scroll_frame = frame.scroll_frame
+    scroll_frame.speed = 6000
+    scroll_frame.start()
+    wait(lambda: scroll_frame.run_words >= 20)
+    scroll_frame.start()
+    stats = scroll_frame.pacingStats()
+    assert stats['wpm'] > 0
+    time.sleep(0.2)
+    qapp.processEvents()
+    assert scroll_frame.pacingStats() == stats
@@ -0,0 +1,55 @@
+import random
+import threading
+
+import pytest
+
+import read
+from search import SearchIndex, normalize
+
+VOCABULARY = ['the', 'then', 'there', 'cat', 'cats', 'dog', 'Dog,', '«the»', 'a', '—']
+
+
+def brute_force(words, terms):
+    hits = []
+    for position in range(len(words) - len(terms) + 1):
+        current = [normalize(word) for word in words[position:position + len(terms)]]
+        if current[:-1] == terms[:-1] and current[-1].startswith(terms[-1]):
+            hits.append(position)
+    return hits
+
+
+@pytest.mark.parametrize('query', ['the', 'the cat', 'the ca', 'cat the', 'dog the th', 'the the the', 'a —', 'x y'])
+def test_find_matches_brute_force(query):
+    rng = random.Random(query)
+    words = [rng.choice(VOCABULARY) for _ in range(5000)]
+    index = SearchIndex.build(words)
+    terms = [normalize(term) for term in read.TOKEN.findall(query)]
+    terms = [term for term in terms if term]
+    expected = brute_force(words, terms) if terms else []
+
+    total, hits = index.find(query, limit=len(words))
+    assert (total, hits) == (len(expected), expected)
+    assert index.find(query, limit=10) == (len(expected), expected[:10])
+
+
+class LazyWords(list):
+    lazy = True
+
+    def __init__(self, words):
+        super().__init__(words)
+        self.threads = set()
+
+    def __getitem__(self, i):
+        self.threads.add(threading.get_ident())
+        return super().__getitem__(i)
+
+
+def test_lazy_snippets_are_built_off_the_gui_thread(wait):
+    main = pytest.importorskip('main')
+    words = LazyWords(f'w{i}' for i in range(100))
+    model = main.SearchResults(2)
+    model.setHits(words, [10, 50])
+    assert model.index(0).data().startswith('Загрузка')
+    wait(lambda: len(model.snippets) == 2)
+    assert [model.index(row).data() for row in range(2)] == ['w8 w9 w10 w11', 'w48 w49 w50 w51']
+    assert threading.get_ident() not in words.threads
@@ -0,0 +1,51 @@
+import random
+
+from segments import HYPHEN, SegmentView, segment, split_word
+
+
+def measure(text):
+    return 10 * len(text)
+
+
+def random_words(rng, count):
+    return [''.join(rng.choice('abcdefgh') for _ in range(rng.choice([1, 3, 5, 8, 20, 40])))
+            for _ in range(count)]
+
+
+def test_split_word_fits_limit_and_rejoins():
+    rng = random.Random(10)
+    for _ in range(500):
+        word = ''.join(rng.choice('abc') for _ in range(rng.randint(1, 60)))
+        limit = rng.randint(30, 200)
+        pieces = split_word(word, limit, measure)
+        assert ''.join(piece[:-1] for piece in pieces[:-1]) + pieces[-1] == word
+        assert all(piece.endswith(HYPHEN) for piece in pieces[:-1])
+        assert all(measure(piece + ' ') <= limit for piece in pieces)
+
+
+def test_to_source_and_to_display_round_trip():
+    rng = random.Random(11)
+    for _ in range(200):
+        words = random_words(rng, rng.randint(1, 200))
+        widths = {word: measure(word + ' ') for word in words}
+        view = segment(words, widths, 120, measure)
+        if view is words:
+            continue
+        assert isinstance(view, SegmentView)
+        assert list(view) == [view[i] for i in range(len(view))]
+
+        for position in range(len(words)):
+            display = view.to_display(position)
+            assert view.to_source(display) == (position, 0)
+            pieces = split_word(words[position], 120, measure) if widths[words[position]] > 120 else [words[position]]
+            for piece in range(len(pieces)):
+                assert view.to_source(view.to_display(position, piece)) == (position, piece)
+                assert view[view.to_display(position, piece)] == pieces[piece]
+
+        for display in range(len(view)):
+            assert view.to_display(*view.to_source(display)) == display
+
+
+def test_unsplit_words_keep_their_positions():
+    words = ['short'] * 10
+    assert segment(words, {'short': measure('short ')}, 120, measure) is words
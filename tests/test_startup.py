@@ -0,0 +1,15 @@
+import pytest
+
+import bench
+
+IMPORT_SECONDS = 2.0
+FIRST_PAINT_SECONDS = 2.0
+
+
+def test_startup_is_fast_and_skips_fitz(qapp):
+    pytest.importorskip('main')
+    result = bench.bench_startup()
+    assert not result['fitz imported']
+    assert result['import seconds'] < IMPORT_SECONDS
+    assert result['first paint seconds'] is not None
+    assert result['first paint seconds'] < FIRST_PAINT_SECONDS
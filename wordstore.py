@@ -0,0 +1,66 @@
+import sys
+from array import array
+
+SEPARATOR = b'\n'
+
+
+class WordStore:
+    ITER_CHUNK = 1 << 16
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_words(cls, words):
+        blob = bytearray()
+        offsets = array('Q', [0])
+        for word in words:
+            blob += word.encode('utf-8')
+            blob += SEPARATOR
+            offsets.append(len(blob))
+        return cls(blob, offsets)
+
+    @classmethod
+    def from_buffer(cls, buffer, count):
+        buffer = memoryview(buffer)
+        size = 8 * (count + 1)
+        if len(buffer) < size:
+            raise ValueError('word store offsets are truncated')
+        if sys.byteorder == 'little':
+            offsets = buffer[:size].cast('Q')
+        else:
+            offsets = array('Q')
+            offsets.frombytes(buffer[:size])
+            offsets.byteswap()
+        if offsets[-1] > len(buffer) - size:
+            raise ValueError('word store blob is truncated')
+        return cls(buffer[size:], offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        offsets = self.offsets
+        if i < 0:
+            i += len(offsets) - 1
+            if i < 0:
+                raise IndexError('word index out of range')
+        return str(self.blob[offsets[i]:offsets[i + 1] - 1], 'utf-8')
+
+    def __iter__(self):
+        for i in range(0, len(self), self.ITER_CHUNK):
+            j = min(i + self.ITER_CHUNK, len(self))
+            yield from str(self.blob[self.offsets[i]:self.offsets[j] - 1], 'utf-8').split('\n')
+
+    def nbytes(self):
+        return len(self.blob) + 8 * len(self.offsets)
+
+    def offsets_bytes(self):
+        if sys.byteorder == 'little':
+            return bytes(self.offsets)
+        offsets = array('Q', self.offsets)
+        offsets.byteswap()
+        return offsets.tobytes()